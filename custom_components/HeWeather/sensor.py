@@ -1,26 +1,84 @@
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import time
 from datetime import timedelta
+import aiohttp
+import async_timeout
 import voluptuous as vol
-import requests
+from homeassistant.components import websocket_api
 from homeassistant.components.sensor import PLATFORM_SCHEMA
+from homeassistant.const import CONF_NAME
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 import homeassistant.helpers.config_validation as cv
-from homeassistant.util import Throttle
-from requests.exceptions import (
-    ConnectionError as ConnectError, HTTPError, Timeout)
+from homeassistant.util import slugify
+import homeassistant.util.dt as dt_util
 
 # REQUIREMENTS = ['pyopenssl', 'ndg-httpsclient', 'pyasn1']
 _LOGGER = logging.getLogger(__name__)
 
 TIME_BETWEEN_UPDATES = timedelta(minutes=30)
+# Lifestyle and forecast change a few times a day only
+DEFAULT_INTERVALS = {
+    "now": TIME_BETWEEN_UPDATES,
+    "air": TIME_BETWEEN_UPDATES,
+    "lifestyle": timedelta(hours=6),
+    "forecast": timedelta(hours=3),
+    "hourly": timedelta(hours=1),
+}
+# Calls per day of a free key, shared by all platforms using the key
+DEFAULT_DAILY_BUDGET = 1000
+API_URL = "https://free-api.heweather.com/s6/"
+REQUEST_TIMEOUT = 10
+# Retry a failed endpoint after 1 min, doubled after every failure
+RETRY_INTERVAL = 60
+MAX_RETRY_INTERVAL = 2 * 60 * 60
+
+STORAGE_KEY = "heweather_{}"
+BUDGET_STORAGE_KEY = "heweather_budget_{}"
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 60
 
 CONF_OPTIONS = "options"
 CONF_CITY = "city"
 CONF_AQI_CITY = "aqi_city"
 CONF_APPKEY = "appkey"
-
-life_index_list = {"comf_txt": None, "drsg_txt": None, "flu_txt": None,
-                   "sport_txt": None, "trav_txt": None, "uv_txt": None, "cw_txt": None}
+CONF_LOCATIONS = "locations"
+CONF_FIXTURE_DIR = "fixture_dir"
+CONF_INTERVALS = "intervals"
+CONF_DAILY_BUDGET = "daily_budget"
+
+DATA_HEWEATHER_BUDGETS = "heweather_budgets"
+# Entity id of a forecast sensor -> its WeatherData
+DATA_HEWEATHER_FORECASTS = "heweather_forecasts"
+
+WS_TYPE_FORECAST_SUBSCRIBE = "heweather/forecast/subscribe"
+
+# Order of the lifestyle indices in the API response
+LIFE_INDEX = ["comf", "drsg", "flu", "sport", "trav", "uv", "cw"]
+
+# Option codes served by every endpoint
+NOW_KEYS = ["fl", "cond_txt", "hum", "pcpn", "pres", "tmp", "vis", "wind_spd", "wind_dir",
+            "cond_code"]
+AIR_KEYS = ["qlty", "aqi", "pm10", "pm25", "main"]
+FORECAST_KEYS = ["tmp_max", "tmp_min", "pop", "wind_sc"]
+ENDPOINT_OPTIONS = {
+    "now": NOW_KEYS,
+    "air": AIR_KEYS,
+    "lifestyle": LIFE_INDEX,
+    "forecast": FORECAST_KEYS + ["forecast"],
+    "hourly": ["forecast"],
+}
+
+# Columns of the forecast series, kept as parallel arrays
+DAILY_COLUMNS = ["date", "tmp_max", "tmp_min", "pop", "wind_spd"]
+HOURLY_COLUMNS = ["time", "tmp", "pop", "wind_spd"]
 
 OPTIONS = dict(fl=["HeWeather_fl", "实时体感温度", "mdi:temperature-celsius", "℃"],
                tmp=["HeWeather_tmp", "实时室外温度", "mdi:thermometer", "℃"],
@@ -47,45 +105,100 @@ OPTIONS = dict(fl=["HeWeather_fl", "实时体感温度", "mdi:temperature-celsiu
                tmp_max=["HeWeather_tmp_max", "今日最高温度", "mdi:mdi:thermometer", "℃"],
                tmp_min=["HeWeather_tmp_min", "今日最低温度", "mdi:mdi:thermometer", "℃"],
                pop=["HeWeather_pop", "降水概率", "mdi:weather-rainy", "%"],
+               forecast=["HeWeather_forecast", "明日最低温度", "mdi:calendar-text", "℃"],
                cond_code=[])
 
 ATTR_UPDATE_TIME = "更新时间"
-ATTRIBUTION = "Powered by He Weather"
+ATTRIBUTION = "Powered by HeWeather"
 ATTRIBUTION_SUGGESTION = "生活建议"
+ATTR_DAILY = "daily"
+ATTR_HOURLY = "hourly"
 
-PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
+LOCATION_SCHEMA = vol.Schema(
     {
+        vol.Required(CONF_NAME): cv.string,
         vol.Required(CONF_CITY): cv.string,
+        vol.Optional(CONF_AQI_CITY): cv.string,
+    }
+)
+
+PLATFORM_SCHEMA = vol.All(PLATFORM_SCHEMA.extend(
+    {
+        vol.Optional(CONF_CITY): cv.string,
         vol.Required(CONF_APPKEY): cv.string,
-        vol.Required(CONF_AQI_CITY): cv.string,        
+        vol.Optional(CONF_AQI_CITY): cv.string,
+        # More places with their own sensors, e.g. home and office
+        vol.Optional(CONF_LOCATIONS, default=[]): vol.All(cv.ensure_list, [LOCATION_SCHEMA]),
         vol.Required(CONF_OPTIONS, default=[]): vol.All(cv.ensure_list, [vol.In(OPTIONS)]),
+        # Read <endpoint>.json from this directory instead of the API
+        vol.Optional(CONF_FIXTURE_DIR): cv.isdir,
+        vol.Optional(CONF_INTERVALS, default={}): {
+            vol.In(DEFAULT_INTERVALS): cv.time_period},
+        vol.Optional(CONF_DAILY_BUDGET, default=DEFAULT_DAILY_BUDGET): cv.positive_int,
     }
-)
+), cv.has_at_least_one_key(CONF_CITY, CONF_LOCATIONS))
 
 
-def setup_platform(hass, config, add_entities, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     _LOGGER.info("Setup platform sensor.HeWeather")
-    city = config.get(CONF_CITY)
     appkey = config.get(CONF_APPKEY)
-    aqi_city = config.get(CONF_AQI_CITY)
-    data = WeatherData(city, appkey, aqi_city)
-
+    budgets = hass.data.setdefault(DATA_HEWEATHER_BUDGETS, {})
+    if appkey not in budgets:
+        budgets[appkey] = CallBudget(hass, appkey, config[CONF_DAILY_BUDGET])
+    await budgets[appkey].async_load()
+    if DATA_HEWEATHER_FORECASTS not in hass.data:
+        hass.data[DATA_HEWEATHER_FORECASTS] = {}
+        websocket_api.async_register_command(hass, websocket_subscribe_forecast)
+    intervals = dict(DEFAULT_INTERVALS, **config[CONF_INTERVALS])
+
+    # The sensors of city keep their names without location prefix
+    locations = list(config[CONF_LOCATIONS])
+    if CONF_CITY in config:
+        locations.insert(0, {CONF_CITY: config[CONF_CITY],
+                             CONF_AQI_CITY: config.get(CONF_AQI_CITY)})
+
+    coordinator = WeatherCoordinator(hass)
     dev = []
-    for option in config[CONF_OPTIONS]:
-        dev.append(HeWeatherSensor(data, option))
-    add_entities(dev, True)
+    for location in locations:
+        city = location[CONF_CITY]
+        data = WeatherData(hass, city, appkey, location.get(CONF_AQI_CITY) or city,
+                           config.get(CONF_FIXTURE_DIR), config[CONF_OPTIONS], intervals,
+                           budgets[appkey])
+        coordinator.add(data)
+        for option in config[CONF_OPTIONS]:
+            dev.append(HeWeatherSensor(data, option, location.get(CONF_NAME)))
+
+    # Sensors start with the cached responses, the fetch runs in background
+    await coordinator.async_load()
+    async_add_entities(dev)
+
+    # One fetch for all sensors, the new snapshot is pushed to every sensor
+    hass.async_create_task(coordinator.async_refresh())
 
 
 class HeWeatherSensor(Entity):
-    def __init__(self, data, option):
+    def __init__(self, data, option, location=None):
         self._data = data
         self._object_id = OPTIONS[option][0]
         self._friendly_name = OPTIONS[option][1]
+        if location is not None:
+            self._object_id = "HeWeather_{}_{}".format(location, option)
+            self._friendly_name = "{} {}".format(location, self._friendly_name)
         self._icon = OPTIONS[option][2]
         self._unit_of_measurement = OPTIONS[option][3]
         self._type = option
-        self._state = None
-        self._updatetime = None
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(self._data.async_add_listener(self.async_write_ha_state))
+        if self._type == "forecast":
+            forecasts = self.hass.data[DATA_HEWEATHER_FORECASTS]
+            forecasts[self.entity_id] = self._data
+            self.async_on_remove(
+                lambda entity_id=self.entity_id: forecasts.pop(entity_id, None))
+
+    @property
+    def should_poll(self):
+        return False
 
     @property
     def name(self):
@@ -97,7 +210,7 @@ class HeWeatherSensor(Entity):
 
     @property
     def state(self):
-        return self._state
+        return self._data.data.get(self._type)
 
     @property
     def icon(self):
@@ -109,318 +222,329 @@ class HeWeatherSensor(Entity):
 
     @property
     def device_state_attributes(self):
-        global ATTRIBUTION
-
-        if self._friendly_name == "舒适度指数":
-            ATTRIBUTION = life_index_list['comf_txt']
-        elif self._friendly_name == "穿衣指数":
-            ATTRIBUTION = life_index_list["drsg_txt"]
-        elif self._friendly_name == "感冒指数":
-            ATTRIBUTION = life_index_list["flu_txt"]
-        elif self._friendly_name == "运动指数":
-            ATTRIBUTION = life_index_list["sport_txt"]
-        elif self._friendly_name == "出行指数":
-            ATTRIBUTION = life_index_list["trav_txt"]
-        elif self._friendly_name == "紫外线指数":
-            ATTRIBUTION = life_index_list["uv_txt"]
-        elif self._friendly_name == "洗车指数":
-            ATTRIBUTION = life_index_list["cw_txt"]
-        else:
-            ATTRIBUTION = "Powered by HeWeather"
-
-        return {
-            ATTR_UPDATE_TIME: self._updatetime,
-            ATTRIBUTION_SUGGESTION: ATTRIBUTION,
-        }
-
-    def update(self):
-        self._data.update()
-        self._updatetime = self._data.updatetime
-
-        if self._type == "fl":
-            self._state = self._data.fl
-        elif self._type == "tmp":
-            self._state = self._data.tmp
-        elif self._type == "cond_txt":
-            self._state = self._data.cond_txt
-        elif self._type == "wind_spd":
-            self._state = self._data.wind_spd
-        elif self._type == "hum":
-            self._state = self._data.hum
-        elif self._type == "pcpn":
-            self._state = self._data.pcpn
-        elif self._type == "pres":
-            self._state = self._data.pres
-        elif self._type == "vis":
-            self._state = self._data.vis
-        elif self._type == "wind_sc":
-            self._state = self._data.wind_sc
-        elif self._type == "wind_dir":
-            self._state = self._data.wind_dir
-        elif self._type == "qlty":
-            self._state = self._data.qlty
-        elif self._type == "main":
-            self._state = self._data.main
-        elif self._type == "aqi":
-            self._state = self._data.aqi
-        elif self._type == "pm10":
-            self._state = self._data.pm10
-        elif self._type == "pm25":
-            self._state = self._data.pm25
-        elif self._type == "cw":
-            self._state = self._data.cw
-        elif self._type == "comf":
-            self._state = self._data.comf
-        elif self._type == "drsg":
-            self._state = self._data.drsg
-        elif self._type == "flu":
-            self._state = self._data.flu
-        elif self._type == "sport":
-            self._state = self._data.sport
-        elif self._type == "trav":
-            self._state = self._data.trav
-        elif self._type == "uv":
-            self._state = self._data.uv
-        elif self._type == "tmp_max":
-            self._state = self._data.tmp_max
-        elif self._type == "tmp_min":
-            self._state = self._data.tmp_min
-        elif self._type == "pop":
-            self._state = self._data.pop
-
-
-class WeatherData(object):
-    def __init__(self, city, appkey, aqi_city):
-        self._url = "https://free-api.heweather.com/s6/weather/now"
-        self._air_url = "https://free-api.heweather.com/s6/air/now"
-        self._life_index_url = "https://free-api.heweather.com/s6/weather/lifestyle"
-        self._long_weather_forcasting_url = "https://free-api.heweather.com/s6/weather/forecast"
-        self._params = {"location": city, "key": appkey}
-        self._aqi_params = {"location": aqi_city, "key": appkey}
-        self._fl = None
-        self._tmp = None
-        self._cond_txt = None
-        self._wind_spd = None
-        self._hum = None
-        self._pcpn = None
-        self._pres = None
-        self._vis = None
-        self._wind_sc = None
-        self._wind_dir = None
-        self._qlty = None
-        self._main = None
-        self._aqi = None
-        self._pm10 = None
-        self._pm25 = None
-        self._updatetime = None
-        self._comf = None
-        self._cw = None
-        self._drsg = None
-        self._flu = None
-        self._sport = None
-        self._uv = None
-        self._trav = None
-        self._tmp_max = None
-        self._tmp_min = None
-        self._pop = None
+        return self._data.attributes.get(self._type)
 
-    @property
-    def fl(self):
-        return self._fl
-
-    @property
-    def tmp(self):
-        return self._tmp
-
-    @property
-    def cond_txt(self):
-        return self._cond_txt
 
-    @property
-    def wind_spd(self):
-        return self._wind_spd
+class WeatherCoordinator(object):
+    def __init__(self, hass):
+        self._hass = hass
+        self._locations = []
 
-    @property
-    def wind_dir(self):
-        return self._wind_dir
+    def add(self, data):
+        self._locations.append(data)
 
-    @property
-    def hum(self):
-        return self._hum
+    async def async_load(self):
+        await asyncio.gather(*[data.async_load() for data in self._locations])
 
-    @property
-    def pcpn(self):
-        return self._pcpn
+    async def async_refresh(self):
+        # All locations share HA's session and are fetched concurrently.
+        # The s6 API takes one location per call, so there is nothing to merge.
+        await asyncio.gather(*[data.async_refresh() for data in self._locations])
+        next_fetches = [data.next_fetch() for data in self._locations
+                        if data.next_fetch() is not None]
+        if next_fetches:
+            async_call_later(self._hass, max(min(next_fetches) - time.time(), 0),
+                             self._async_scheduled_refresh)
 
-    @property
-    def pres(self):
-        return self._pres
+    async def _async_scheduled_refresh(self, now):
+        await self.async_refresh()
 
-    @property
-    def vis(self):
-        return self._vis
-
-    @property
-    def wind_sc(self):
-        return self._wind_sc
-
-    @property
-    def qlty(self):
-        return self._qlty
-
-    @property
-    def main(self):
-        return self._main
-
-    @property
-    def aqi(self):
-        return self._aqi
 
-    @property
-    def pm10(self):
-        return self._pm10
-
-    @property
-    def pm25(self):
-        return self._pm25
-
-    @property
-    def comf(self):
-        return self._comf
-
-    @property
-    def cw(self):
-        return self._cw
-
-    @property
-    def drsg(self):
-        return self._drsg
-
-    @property
-    def flu(self):
-        return self._flu
-
-    @property
-    def sport(self):
-        return self._sport
-
-    @property
-    def uv(self):
-        return self._uv
-
-    @property
-    def trav(self):
-        return self._trav
-
-    @property
-    def tmp_max(self):
-        return self._tmp_max
-
-    @property
-    def tmp_min(self):
-        return self._tmp_min
-
-    @property
-    def pop(self):
-        return self._pop
-
-    @property
-    def updatetime(self):
-        return self._updatetime
-
-    def now(self):
-        now_weather = requests.post(self._url, self._params)
-        con = now_weather.json()
-        return con
-
-    def air(self):
-        r_air = requests.post(self._air_url, self._aqi_params)
-        con_air = r_air.json()
-        return con_air
-
-    def life(self):
-        life_index = requests.post(self._life_index_url, self._params)
-        con_life_index = life_index.json()
-        return con_life_index
-
-    def today(self):
-        today_weather = requests.post(self._long_weather_forcasting_url, self._params)
-        con_today_weather = today_weather.json()
-        return con_today_weather
-
-    @Throttle(TIME_BETWEEN_UPDATES)
-    def update(self):
-        import time
-        try:
-            con = self.now()
-        except (ConnectError, HTTPError, Timeout, ValueError) as error:
-            time.sleep(0.01)
-            con = self.now()
-            _LOGGER.error("Unable to connect to HeWeather. %s", error)
-        try:
-            con_air = self.air()
-        except (ConnectError, HTTPError, Timeout, ValueError) as error:
-            time.sleep(0.01)
-            con_air = self.air()
-            _LOGGER.error("Unable to connect to HeWeather. %s", error)
-        try:
-            con_life_index = self.life()
-        except (ConnectError, HTTPError, Timeout, ValueError) as error:
-            time.sleep(0.01)
-            con_life_index = self.life()
-            _LOGGER.error("Unable to connect to HeWeather. %s", error)
+class WeatherData(object):
+    def __init__(self, hass, city, appkey, aqi_city, fixture_dir=None,
+                 options=None, intervals=None, budget=None):
+        self._hass = hass
+        # Shared keep-alive session of HA
+        self._session = async_get_clientsession(hass)
+        self._params = {"location": city, "key": appkey}
+        self._aqi_params = {"location": aqi_city, "key": appkey}
+        self._endpoints = {
+            "now": (API_URL + "weather/now",
+                    self._params, parse_now),
+            "air": (API_URL + "air/now",
+                    self._aqi_params, parse_air),
+            "lifestyle": (API_URL + "weather/lifestyle",
+                          self._params, parse_life),
+            "forecast": (API_URL + "weather/forecast",
+                         self._params, parse_today),
+            "hourly": (API_URL + "weather/hourly",
+                       self._params, parse_hourly),
+        }
+        self._options = list(OPTIONS) if options is None else options
+        # Only fetch endpoints whose data is used by a configured sensor
+        if options is not None:
+            self._endpoints = {
+                endpoint: value for endpoint, value in self._endpoints.items()
+                if any(option in options for option in ENDPOINT_OPTIONS[endpoint])}
+        self._intervals = intervals or DEFAULT_INTERVALS
+        self._budget = budget
+        self._fixture_dir = fixture_dir
+        # Last good response of every endpoint with its fetch time. Platforms
+        # fetching other endpoints or aqi_city for the same city use their
+        # own file, a shared one would be overwritten by each of them.
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY.format(
+            slugify("_".join([city, aqi_city] + sorted(self._endpoints)))))
+        self._cache = {}
+        self._failures = {endpoint: 0 for endpoint in self._endpoints}
+        self._next_fetch = {endpoint: 0 for endpoint in self._endpoints}
+        self._listeners = []
+        # Snapshot of the last fetch and the sensor attributes derived
+        # from it once, both keyed by option code
+        self.data = {}
+        self.series = {ATTR_DAILY: ForecastSeries(DAILY_COLUMNS),
+                       ATTR_HOURLY: ForecastSeries(HOURLY_COLUMNS)}
+        self.attributes = {}
+        self.updatetime = None
+
+    @callback
+    def async_add_listener(self, update_callback):
+        # Return a function to remove the listener again
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    async def async_load(self):
+        cache = await self._store.async_load()
+        if not cache:
+            return
+        self._cache = {endpoint: entry for endpoint, entry in cache.items()
+                       if endpoint in self._endpoints}
+        valid = self._async_update_data({endpoint: entry["data"]
+                                         for endpoint, entry in self._cache.items()})
+        # A restart does not refetch what is still fresh in the cache
+        for endpoint in valid:
+            self._next_fetch[endpoint] = \
+                self._cache[endpoint]["time"] + self._intervals[endpoint].total_seconds()
+        if self._cache:
+            self._update_attributes(max(entry["time"] for entry in self._cache.values()))
+
+    async def _async_post(self, url, params):
         try:
-            today_weather = self.today()
-        except (ConnectError, HTTPError, Timeout, ValueError) as error:
-            time.sleep(0.01)
-            today_weather = self.today()
+            with async_timeout.timeout(REQUEST_TIMEOUT):
+                response = await self._session.post(url, data=params)
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
             _LOGGER.error("Unable to connect to HeWeather. %s", error)
+            return None
+
+    async def _async_fetch(self, endpoint):
+        url, params, _ = self._endpoints[endpoint]
+        if self._fixture_dir is not None:
+            return await self._hass.async_add_executor_job(
+                load_fixture, os.path.join(self._fixture_dir, endpoint + ".json"))
+        return await self._async_post(url, params)
+
+    async def async_refresh(self):
+        now = time.time()
+        due = []
+        for endpoint, next_fetch in self._next_fetch.items():
+            if next_fetch > now:
+                continue
+            if self._fixture_dir is None and self._budget is not None \
+                    and not self._budget.acquire():
+                _LOGGER.warning("Daily HeWeather budget used up, skip %s until tomorrow",
+                                endpoint)
+                self._next_fetch[endpoint] = self._budget.reset_time()
+                continue
+            due.append(endpoint)
+        # All endpoints at once, wall time is the slowest request only
+        responses = await asyncio.gather(
+            *[self._async_fetch(endpoint) for endpoint in due])
 
         _LOGGER.info("Update from HeWeather...")
-        try:
-            self._fl = con["HeWeather6"][0]["now"]["fl"]
-            self._cond_txt = con["HeWeather6"][0]["now"]["cond_txt"]
-            self._hum = con["HeWeather6"][0]["now"]["hum"]
-            self._pcpn = con["HeWeather6"][0]["now"]["pcpn"]
-            self._pres = con["HeWeather6"][0]["now"]["pres"]
-            self._tmp = con["HeWeather6"][0]["now"]["tmp"]
-            self._vis = con["HeWeather6"][0]["now"]["vis"]
-            self._wind_spd = con["HeWeather6"][0]["now"]["wind_spd"]
-            self._wind_dir = con["HeWeather6"][0]["now"]["wind_dir"]
-
-            self._cond_code = con["HeWeather6"][0]["now"]["cond_code"]
-
-            self._qlty = con_air["HeWeather6"][0]["air_now_city"]["qlty"]
-            self._aqi = con_air["HeWeather6"][0]["air_now_city"]["aqi"]
-            self._pm10 = con_air["HeWeather6"][0]["air_now_city"]["pm10"]
-            self._pm25 = con_air["HeWeather6"][0]["air_now_city"]["pm25"]
-            if con_air["HeWeather6"][0]["air_now_city"]["main"] == "-":
-                if int(self._pm10) > int(self._pm25):
-                    self._main = "PM10"
-                elif int(self._pm10) < int(self._pm25):
-                    self._main = "PM25"
-                else:
-                    self._main = "-"
+        fetched = self._async_update_data(dict(zip(due, responses)))
+        for endpoint in due:
+            if endpoint in fetched:
+                self._failures[endpoint] = 0
+                self._next_fetch[endpoint] = now + self._intervals[endpoint].total_seconds()
+                self._cache[endpoint] = {"time": now, "data": fetched[endpoint]}
+            else:
+                # Keep serving the cached response, back off exponentially
+                self._failures[endpoint] += 1
+                self._next_fetch[endpoint] = now + min(
+                    RETRY_INTERVAL * 2 ** (self._failures[endpoint] - 1),
+                    MAX_RETRY_INTERVAL)
+
+        if fetched:
+            self._store.async_delay_save(lambda: self._cache, STORAGE_SAVE_DELAY)
+            self._update_attributes(now)
+            for update_callback in self._listeners:
+                update_callback()
+
+    def next_fetch(self):
+        return min(self._next_fetch.values(), default=None)
+
+    @callback
+    def _async_update_data(self, responses):
+        # Parse into a new snapshot and return the valid responses. Values
+        # of a failed endpoint are kept from the last snapshot.
+        data = dict(self.data)
+        valid = {}
+        for endpoint, response in responses.items():
+            if response is None:
+                continue
+            parse = self._endpoints[endpoint][2]
+            try:
+                parsed = parse(response["HeWeather6"][0])
+                for name, series in self.series.items():
+                    if name in parsed:
+                        series.update(parsed.pop(name))
+                data.update(parsed)
+            except (KeyError, IndexError, TypeError, ValueError) as error:
+                _LOGGER.warning("Unexpected response from HeWeather %s. %s", endpoint, error)
+                continue
+            valid[endpoint] = response
+        self.data = data
+        return valid
+
+    def _update_attributes(self, timestamp):
+        self.updatetime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+        self.attributes = {
+            option: {
+                ATTR_UPDATE_TIME: self.updatetime,
+                # Lifestyle sensors show their suggestion text
+                ATTRIBUTION_SUGGESTION: self.data.get(option + "_txt")
+                if option in LIFE_INDEX else ATTRIBUTION,
+            }
+            for option in self._options}
+
+
+class ForecastSeries(object):
+    def __init__(self, columns):
+        # Column name -> list of values, one entry per forecast step
+        self.columns = {column: [] for column in columns}
+
+    def update(self, rows):
+        # Numbers are stored as int. The lists are refilled in place only
+        # when all columns were converted, a bad value keeps the series.
+        columns = {}
+        for column in self.columns:
+            if column in ("date", "time"):
+                columns[column] = [row[column] for row in rows]
             else:
-                self._main = con_air["HeWeather6"][0]["air_now_city"]["main"]
-
-            self._comf = con_life_index["HeWeather6"][0]["lifestyle"][0]["brf"]
-            self._drsg = con_life_index["HeWeather6"][0]["lifestyle"][1]["brf"]
-            self._flu = con_life_index["HeWeather6"][0]["lifestyle"][2]["brf"]
-            self._sport = con_life_index["HeWeather6"][0]["lifestyle"][3]["brf"]
-            self._trav = con_life_index["HeWeather6"][0]["lifestyle"][4]["brf"]
-            self._uv = con_life_index["HeWeather6"][0]["lifestyle"][5]["brf"]
-            self._cw = con_life_index["HeWeather6"][0]["lifestyle"][6]["brf"]
-            life = ["comf_txt", "drsg_txt", "flu_txt", "sport_txt", "trav_txt", "uv_txt", "cw_txt"]
-            for i, index in enumerate(life):
-                life_index_list[index] = con_life_index["HeWeather6"][0]["lifestyle"][i]["txt"]
-
-            self._tmp_max = today_weather["HeWeather6"][0]["daily_forecast"][0]["tmp_max"]
-            self._tmp_min = today_weather["HeWeather6"][0]["daily_forecast"][0]["tmp_min"]
-            self._pop = today_weather["HeWeather6"][0]["daily_forecast"][0]["pop"]
-            self._wind_sc = today_weather["HeWeather6"][0]["daily_forecast"][0]["wind_sc"]
-        except Exception as e:
-            logging.info(e)
-
-        import time
-        self._updatetime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+                columns[column] = [int(row[column]) for row in rows]
+        for column, values in self.columns.items():
+            values[:] = columns[column]
+
+
+def forecast_series(data):
+    # The lists themselves, they are refilled on the next update
+    return {name: series.columns for name, series in data.series.items()}
+
+
+@callback
+@websocket_api.websocket_command({
+    vol.Required("type"): WS_TYPE_FORECAST_SUBSCRIBE,
+    vol.Required("entity_id"): cv.entity_id,
+})
+def websocket_subscribe_forecast(hass, connection, msg):
+    # The series are sent on subscribe and after every update instead of
+    # being state attributes, which HA would copy into every state and the
+    # recorder would store as JSON
+    data = hass.data[DATA_HEWEATHER_FORECASTS].get(msg["entity_id"])
+    if data is None:
+        connection.send_error(msg["id"], websocket_api.const.ERR_NOT_FOUND,
+                              "Forecast sensor not found")
+        return
+
+    @callback
+    def forward_series():
+        connection.send_message(
+            websocket_api.event_message(msg["id"], forecast_series(data)))
+
+    connection.subscriptions[msg["id"]] = data.async_add_listener(forward_series)
+    connection.send_result(msg["id"])
+    forward_series()
+
+
+class CallBudget(object):
+    def __init__(self, hass, appkey, limit):
+        self._limit = limit
+        self._day = None
+        self._calls = 0
+        self._loaded = False
+        # The count of today survives restarts, the file is named by a
+        # hash of the key instead of the key itself
+        self._store = Store(hass, STORAGE_VERSION, BUDGET_STORAGE_KEY.format(
+            hashlib.sha1(appkey.encode()).hexdigest()[:8]))
+
+    async def async_load(self):
+        # Shared by all platforms of a key, loaded by the first one
+        if self._loaded:
+            return
+        self._loaded = True
+        stored = await self._store.async_load()
+        today = dt_util.now().date()
+        if not stored or stored["day"] != today.isoformat():
+            return
+        # Calls counted while loading are added to the stored ones
+        if self._day != today:
+            self._day = today
+            self._calls = 0
+        self._calls += stored["calls"]
+
+    def acquire(self):
+        # Count one API call, False if the budget of today is used up
+        today = dt_util.now().date()
+        if today != self._day:
+            self._day = today
+            self._calls = 0
+        if self._calls >= self._limit:
+            return False
+        self._calls += 1
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+        return True
+
+    def _data_to_save(self):
+        return {"day": self._day.isoformat(), "calls": self._calls}
+
+    def reset_time(self):
+        # Timestamp of the next local midnight
+        return dt_util.as_timestamp(dt_util.start_of_local_day() + timedelta(days=1))
+
+
+def load_fixture(path):
+    try:
+        with open(path, encoding="utf-8") as fixture:
+            return json.load(fixture)
+    except (OSError, ValueError) as error:
+        _LOGGER.error("Unable to load HeWeather fixture. %s", error)
+        return None
+
+
+def parse_now(con):
+    now = con["now"]
+    return {key: now[key] for key in NOW_KEYS}
+
+
+def parse_air(con):
+    air = con["air_now_city"]
+    data = {key: air[key] for key in AIR_KEYS}
+    if data["main"] == "-":
+        if int(data["pm10"]) > int(data["pm25"]):
+            data["main"] = "PM10"
+        elif int(data["pm10"]) < int(data["pm25"]):
+            data["main"] = "PM25"
+    return data
+
+
+def parse_life(con):
+    lifestyle = con["lifestyle"]
+    data = {}
+    for i, index in enumerate(LIFE_INDEX):
+        data[index] = lifestyle[i]["brf"]
+        data[index + "_txt"] = lifestyle[i]["txt"]
+    return data
+
+
+def parse_today(con):
+    daily = con["daily_forecast"]
+    data = {key: daily[0][key] for key in FORECAST_KEYS}
+    data[ATTR_DAILY] = daily
+    # Minimum temperature of tomorrow, e.g. for pre-heating
+    if len(daily) > 1:
+        data["forecast"] = int(daily[1]["tmp_min"])
+    return data
+
+
+def parse_hourly(con):
+    return {ATTR_HOURLY: con["hourly"]}
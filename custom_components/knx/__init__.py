@@ -1,13 +1,17 @@
 """Support KNX devices."""
+import asyncio
 import logging
+import random
 
 import voluptuous as vol
 
 from homeassistant.const import (
-    CONF_ENTITY_ID, CONF_HOST, CONF_PORT, EVENT_HOMEASSISTANT_STOP)
+    ATTR_ENTITY_ID, CONF_ENTITY_ID, CONF_HOST, CONF_PORT,
+    EVENT_HOMEASSISTANT_STOP, EVENT_STATE_CHANGED, SERVICE_TURN_OFF, STATE_ON)
 from homeassistant.core import callback
 from homeassistant.helpers import discovery
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.event import async_track_state_change
 from homeassistant.helpers.script import Script
 
@@ -26,6 +30,9 @@ CONF_KNX_FIRE_EVENT = "fire_event"
 CONF_KNX_FIRE_EVENT_FILTER = "fire_event_filter"
 CONF_KNX_STATE_UPDATER = "state_updater"
 CONF_KNX_RATE_LIMIT = "rate_limit"
+CONF_KNX_STATE_WRITE_WINDOW = "state_write_window"
+CONF_KNX_COVER_UPDATE_INTERVAL = "cover_update_interval"
+CONF_KNX_LIGHT_BURST_WRITES = "light_burst_writes"
 CONF_KNX_EXPOSE = "expose"
 CONF_KNX_EXPOSE_TYPE = "type"
 CONF_KNX_EXPOSE_ADDRESS = "address"
@@ -33,9 +40,17 @@ CONF_KNX_EXPOSE_ADDRESS = "address"
 SERVICE_KNX_SEND = "send"
 SERVICE_KNX_ATTR_ADDRESS = "address"
 SERVICE_KNX_ATTR_PAYLOAD = "payload"
+SERVICE_KNX_TURN_OFF_DOMAIN = "turn_off_domain"
+SERVICE_KNX_ATTR_DOMAIN = "domain"
 
 ATTR_DISCOVER_DEVICES = 'devices'
 
+SIGNAL_KNX_CONNECTION_STATE = 'knx_connection_state'
+
+# Reconnect backoff in seconds, doubled after every failed attempt
+RECONNECT_INTERVAL_MIN = 5
+RECONNECT_INTERVAL_MAX = 300
+
 TUNNELING_SCHEMA = vol.Schema({
     vol.Required(CONF_HOST): cv.string,
     vol.Required(CONF_KNX_LOCAL_IP): cv.string,
@@ -65,6 +80,11 @@ CONFIG_SCHEMA = vol.Schema({
         vol.Optional(CONF_KNX_STATE_UPDATER, default=True): cv.boolean,
         vol.Optional(CONF_KNX_RATE_LIMIT, default=20):
             vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+        vol.Optional(CONF_KNX_STATE_WRITE_WINDOW):
+            vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+        vol.Optional(CONF_KNX_COVER_UPDATE_INTERVAL, default=1):
+            vol.All(vol.Coerce(float), vol.Range(min=0, max=60)),
+        vol.Optional(CONF_KNX_LIGHT_BURST_WRITES, default=False): cv.boolean,
         vol.Optional(CONF_KNX_EXPOSE):
             vol.All(
                 cv.ensure_list,
@@ -78,6 +98,10 @@ SERVICE_KNX_SEND_SCHEMA = vol.Schema({
         cv.positive_int, [cv.positive_int]),
 })
 
+SERVICE_KNX_TURN_OFF_DOMAIN_SCHEMA = vol.Schema({
+    vol.Optional(SERVICE_KNX_ATTR_DOMAIN, default='light'): cv.string,
+})
+
 
 async def async_setup(hass, config):
     """Set up the KNX component."""
@@ -93,6 +117,7 @@ async def async_setup(hass, config):
             "Can't connect to KNX interface: <br>"
             "<b>{0}</b>".format(ex),
             title="KNX")
+        hass.data[DATA_KNX].async_start_reconnect()
 
     for component, discovery_type in (
             ('switch', 'Switch'),
@@ -114,6 +139,12 @@ async def async_setup(hass, config):
         hass.data[DATA_KNX].service_send_to_knx_bus,
         schema=SERVICE_KNX_SEND_SCHEMA)
 
+    hass.data[DATA_KNX].state_index.async_start()
+    hass.services.async_register(
+        DOMAIN, SERVICE_KNX_TURN_OFF_DOMAIN,
+        hass.data[DATA_KNX].service_turn_off_domain,
+        schema=SERVICE_KNX_TURN_OFF_DOMAIN_SCHEMA)
+
     return True
 
 
@@ -134,9 +165,18 @@ class KNXModule:
         self.hass = hass
         self.config = config
         self.connected = False
+        self.connected_since = None
+        self.disconnected_since = None
         self.init_xknx()
         self.register_callbacks()
         self.exposures = []
+        self._device_updated = {}
+        self._reconnect_task = None
+        self.state_index = EntityStateIndex(hass)
+        self.state_writer = None
+        if CONF_KNX_STATE_WRITE_WINDOW in self.config[DOMAIN]:
+            self.state_writer = KNXStateWriter(
+                hass, self.config[DOMAIN][CONF_KNX_STATE_WRITE_WINDOW])
 
     def init_xknx(self):
         """Initialize of KNX object."""
@@ -146,16 +186,158 @@ class KNXModule:
 
     async def start(self):
         """Start KNX object. Connect to tunneling or Routing device."""
+        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.stop)
+        await self.connect(
+            state_updater=self.config[DOMAIN][CONF_KNX_STATE_UPDATER])
+
+    async def connect(self, state_updater):
+        """Connect XKNX to the configured tunneling or routing device."""
         connection_config = self.connection_config()
         await self.xknx.start(
-            state_updater=self.config[DOMAIN][CONF_KNX_STATE_UPDATER],
+            state_updater=state_updater,
             connection_config=connection_config)
-        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.stop)
+        self.hook_tunnel()
         self.connected = True
+        self.connected_since = self.hass.loop.time()
 
     async def stop(self, event):
         """Stop KNX object. Disconnect from tunneling or Routing device."""
-        await self.xknx.stop()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        # The telegram queue is not running without a connection,
+        # waiting for it to be drained would block shutdown.
+        if self.xknx.started:
+            await self.xknx.stop()
+
+    async def async_tunnel_lost(self):
+        """Start the supervisor instead of a reconnect by the tunnel itself."""
+        if not self.connected:
+            return
+        _LOGGER.warning("Lost connection to KNX interface")
+        self.async_start_reconnect()
+        # Entities show as unavailable until the supervisor reconnected
+        async_dispatcher_send(self.hass, SIGNAL_KNX_CONNECTION_STATE)
+
+    def hook_tunnel(self):
+        """Route reconnects of the xknx tunnel to the supervisor."""
+        interface = self.xknx.knxip_interface.interface
+        # The heartbeat of the tunnel detects the connection loss, after
+        # failed heartbeats or telegrams it calls reconnect(). Reconnecting
+        # is only done by the supervisor, with backoff and resync.
+        # Routing is connectionless and has nothing to reconnect.
+        if hasattr(interface, 'reconnect'):
+            interface.reconnect = self.async_tunnel_lost
+
+    @callback
+    def async_start_reconnect(self):
+        """Start the supervisor reconnecting to the KNX interface."""
+        if self._reconnect_task is not None:
+            return
+        self.connected = False
+        if self.disconnected_since is None:
+            self.disconnected_since = self.hass.loop.time()
+        # Not tracked by hass, a long outage must not block startup.
+        self._reconnect_task = self.hass.loop.create_task(self.reconnect())
+
+    async def reconnect(self):
+        """Reconnect with jittered exponential backoff and resync state."""
+        from xknx.exceptions import XKNXException
+        # Without a connection before, no device has a state to keep
+        full_sync = self.connected_since is None
+        if self.xknx.started:
+            self.drop_queued_telegrams()
+            await self.stop_background_tasks()
+        interval = RECONNECT_INTERVAL_MIN
+        while not self.connected:
+            delay = random.uniform(interval / 2, interval)
+            _LOGGER.debug("Reconnecting to KNX interface in %.1f s", delay)
+            await asyncio.sleep(delay)
+            await self.stop_knxip_interface()
+            self.drop_queued_telegrams()
+            try:
+                # After a connection loss the state updater would read every
+                # device right away, only devices with stale state are read.
+                await self.connect(state_updater=(
+                    full_sync and self.config[DOMAIN][CONF_KNX_STATE_UPDATER]))
+            except XKNXException as ex:
+                _LOGGER.debug("Reconnecting to KNX interface failed: %s", ex)
+                interval = min(interval * 2, RECONNECT_INTERVAL_MAX)
+
+        _LOGGER.info("Reconnected to KNX interface after %.0f s",
+                     self.connected_since - self.disconnected_since)
+        self._reconnect_task = None
+        if not full_sync:
+            await self.async_resync_after_reconnect()
+        self.disconnected_since = None
+        # One signal lets all KNX entities write their (available) state
+        # within the same loop iteration.
+        async_dispatcher_send(self.hass, SIGNAL_KNX_CONNECTION_STATE)
+
+    async def async_resync_after_reconnect(self):
+        """Read stale devices and restart the state updater."""
+        await self.resync_stale_devices()
+        if self.config[DOMAIN][CONF_KNX_STATE_UPDATER]:
+            from xknx.core import StateUpdater
+            state_updater = StateUpdater(self.xknx)
+            # Stale devices were just read, skip the initial full sync.
+            state_updater.start_timeout = state_updater.timeout
+            self.xknx.state_updater = state_updater
+            await state_updater.start()
+
+    async def stop_background_tasks(self):
+        """Stop state updater and telegram queue of a lost connection."""
+        state_updater = self.xknx.state_updater
+        if state_updater is not None and state_updater.run_task is not None:
+            state_updater.run_task.cancel()
+        self.xknx.state_updater = None
+        # connect() starts the queue again, only one may consume telegrams
+        await self.xknx.telegram_queue.stop()
+        self.xknx.telegram_queue.queue_stopped.clear()
+        self.xknx.started = False
+
+    async def stop_knxip_interface(self):
+        """Tear down a half opened KNX/IP interface of a failed attempt."""
+        from xknx.exceptions import XKNXException
+        if self.xknx.knxip_interface is None:
+            return
+        try:
+            await self.xknx.knxip_interface.stop()
+        except XKNXException as ex:
+            _LOGGER.debug("Could not stop KNX/IP interface: %s", ex)
+        self.xknx.knxip_interface = None
+
+    def drop_queued_telegrams(self):
+        """Drop telegrams queued while disconnected instead of replaying."""
+        dropped = 0
+        while not self.xknx.telegrams.empty():
+            self.xknx.telegrams.get_nowait()
+            self.xknx.telegrams.task_done()
+            dropped += 1
+        if dropped:
+            _LOGGER.warning(
+                "Dropped %d telegrams queued while disconnected", dropped)
+
+    async def resync_stale_devices(self):
+        """Request state of devices not updated since reconnecting."""
+        for device in self.xknx.devices:
+            # Devices which already sent a telegram on the new connection
+            # are up to date, everything else may have changed meanwhile.
+            updated = self._device_updated.get(device.name)
+            if updated is not None and updated >= self.connected_since:
+                continue
+            await device.sync(wait_for_result=False)
+
+    async def async_update_entity_state(self, entity):
+        """Write state of an entity, coalesced if configured."""
+        if self.state_writer is None:
+            await entity.async_update_ha_state()
+            return
+        self.state_writer.async_schedule(entity)
+
+    async def device_updated_cb(self, device):
+        """Call invoked after a KNX device was updated."""
+        self._device_updated[device.name] = self.hass.loop.time()
 
     def config_file(self):
         """Resolve and return the full path of xknx.yaml if configured."""
@@ -207,6 +389,7 @@ class KNXModule:
 
     def register_callbacks(self):
         """Register callbacks within XKNX object."""
+        self.xknx.devices.register_device_updated_cb(self.device_updated_cb)
         if CONF_KNX_FIRE_EVENT in self.config[DOMAIN] and \
                 self.config[DOMAIN][CONF_KNX_FIRE_EVENT]:
             from xknx.knx import AddressFilter
@@ -264,6 +447,116 @@ class KNXModule:
         telegram.group_address = address
         await self.xknx.telegrams.put(telegram)
 
+    async def service_turn_off_domain(self, call):
+        """Service for turning off all entities of a domain which are on."""
+        domain = call.data.get(SERVICE_KNX_ATTR_DOMAIN)
+        entity_ids = self.state_index.entity_ids(domain, STATE_ON)
+        # Members of a group which is switched off as well are left to the
+        # group, otherwise they get their telegram twice
+        members = set()
+        for entity_id in entity_ids:
+            state = self.hass.states.get(entity_id)
+            if state is not None:
+                members.update(state.attributes.get(ATTR_ENTITY_ID, ()))
+        members &= entity_ids
+        entity_ids -= members
+        if not entity_ids:
+            return
+        _LOGGER.debug("Turning off %d %s entities, %d by their group",
+                      len(entity_ids), domain, len(members))
+        await self.hass.services.async_call(
+            domain, SERVICE_TURN_OFF, {ATTR_ENTITY_ID: sorted(entity_ids)})
+
+
+class EntityStateIndex:
+    """Index entity ids by domain and state.
+
+    Kept up to date from state changed events, so that e.g. all lights
+    which are on are found without scanning the whole state machine.
+    """
+
+    def __init__(self, hass):
+        """Initialize of state index."""
+        self.hass = hass
+        self._index = {}
+
+    @callback
+    def async_start(self):
+        """Index all current states and track their changes."""
+        for state in self.hass.states.async_all():
+            self._add(state)
+        self.hass.bus.async_listen(
+            EVENT_STATE_CHANGED, self._async_state_changed)
+
+    def entity_ids(self, domain, state):
+        """Return entity ids of domain which are in state."""
+        return set(self._index.get((domain, state), ()))
+
+    def _add(self, state):
+        """Add a state to the index."""
+        self._index.setdefault(
+            (state.domain, state.state), set()).add(state.entity_id)
+
+    def _remove(self, state):
+        """Remove a state from the index."""
+        key = (state.domain, state.state)
+        entity_ids = self._index.get(key)
+        if entity_ids is None:
+            return
+        entity_ids.discard(state.entity_id)
+        if not entity_ids:
+            del self._index[key]
+
+    @callback
+    def _async_state_changed(self, event):
+        """Move an entity to the bucket of its new state."""
+        old_state = event.data.get('old_state')
+        new_state = event.data.get('new_state')
+        if old_state is not None and new_state is not None \
+                and old_state.state == new_state.state:
+            return
+        if old_state is not None:
+            self._remove(old_state)
+        if new_state is not None:
+            self._add(new_state)
+
+
+class KNXStateWriter:
+    """Coalesce state writes of KNX entities.
+
+    A device reporting several values in a burst (e.g. switch, brightness
+    and color of a light) triggers one state write per entity within the
+    window. A window of 0 coalesces all updates of one loop iteration.
+    """
+
+    def __init__(self, hass, window):
+        """Initialize of state writer."""
+        self.hass = hass
+        self.window = window
+        self._pending = {}
+        self._flush_handle = None
+
+    @callback
+    def async_schedule(self, entity):
+        """Schedule a state write of entity."""
+        self._pending[entity] = None
+        if self._flush_handle is not None:
+            return
+        if self.window:
+            self._flush_handle = self.hass.loop.call_later(
+                self.window, self._async_flush)
+        else:
+            self._flush_handle = self.hass.loop.call_soon(self._async_flush)
+
+    @callback
+    def _async_flush(self):
+        """Write state of all entities updated within the window."""
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for entity in pending:
+            if entity.hass is not None:
+                entity.async_write_ha_state()
+
 
 class KNXAutomation():
     """Wrapper around xknx.devices.ActionCallback object.."""
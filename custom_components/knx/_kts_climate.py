@@ -24,6 +24,10 @@ class KTSClimate(Device):
     DEFAULT_TARGET_TEMPERATURE_MAX = 35
     DEFAULT_TARGET_TEMPERATURE_MIN = 5
 
+    # Raw values of YORK/DARKIN AC controllers of the KTS router
+    DEFAULT_OPERATION_MODES = {1: 'Cool', 4: 'Heat', 3: 'Fan', 2: 'Dry'}
+    DEFAULT_FAN_MODES = {1: 'Low', 2: 'Medium', 3: 'High', 4: 'Auto'}
+
     def __init__(self,
                  xknx,
                  name,
@@ -39,6 +43,8 @@ class KTSClimate(Device):
                  group_address_fan_mode_state=None,
                  group_address_on_off=None,
                  group_address_on_off_state=None,
+                 operation_modes=None,
+                 fan_modes=None,
                  device_updated_cb=None):
         """Initialize Climate class."""
         # pylint: disable=too-many-arguments, too-many-locals, too-many-branches, too-many-statements
@@ -93,6 +99,40 @@ class KTSClimate(Device):
             device_name=self.name,
             after_update_cb=self.after_update)
 
+        # Raw value <-> mode name lookup tables, configurable per controller
+        self._operation_modes = dict(operation_modes or self.DEFAULT_OPERATION_MODES)
+        self._operation_modes_inv = {
+            mode: value for value, mode in self._operation_modes.items()}
+        self._supported_operation_modes = list(self._operation_modes.values()) \
+            if self.supports_operation_mode else []
+
+        self._fan_modes = dict(fan_modes or self.DEFAULT_FAN_MODES)
+        self._fan_modes_inv = {
+            mode: value for value, mode in self._fan_modes.items()}
+        self._supported_fan_modes = list(self._fan_modes.values()) \
+            if self.supports_fan_mode else []
+
+        # Route incoming telegrams by raw group address to the remote value
+        # owning it, instead of offering each telegram to all of them.
+        self._remote_values_by_address = {}
+        for remote_value in (self.on, self.fan_mode, self.operation_mode,
+                             self.target_temperature, self.temperature):
+            for group_address in (remote_value.group_address,
+                                  remote_value.group_address_state):
+                if group_address is not None:
+                    self._remote_values_by_address[group_address.raw] = \
+                        remote_value
+
+        # Addresses are fixed after initialization
+        self._state_addresses = []
+        self._state_addresses.extend(self.temperature.state_addresses())
+        self._state_addresses.extend(self.target_temperature.state_addresses())
+        self._state_addresses.extend(self.on.state_addresses())
+        if self.supports_operation_mode:
+            self._state_addresses.extend(self.operation_mode.state_addresses())
+        if self.supports_fan_mode:
+            self._state_addresses.extend(self.fan_mode.state_addresses())
+            # Note: telegrams setting splitted up operation modes are not yet implemented
 
     @classmethod
     def from_config(cls, xknx, name, config):
@@ -119,6 +159,8 @@ class KTSClimate(Device):
             config.get('group_address_on_off')
         group_address_on_off_state = \
             config.get('group_address_on_off_state')
+        operation_modes = config.get('operation_modes')
+        fan_modes = config.get('fan_modes')
 
         return cls(xknx,
                    name,
@@ -133,15 +175,13 @@ class KTSClimate(Device):
                    group_address_fan_mode=group_address_fan_mode,
                    group_address_fan_mode_state=group_address_fan_mode_state,
                    group_address_on_off=group_address_on_off,
-                   group_address_on_off_state=group_address_on_off_state)
+                   group_address_on_off_state=group_address_on_off_state,
+                   operation_modes=operation_modes,
+                   fan_modes=fan_modes)
 
     def has_group_address(self, group_address):
         """Test if device has given group address."""
-        return self.temperature.has_group_address(group_address) or \
-            self.target_temperature.has_group_address(group_address) or \
-            self.operation_mode.has_group_address(group_address) or \
-            self.fan_mode.has_group_address(group_address) or \
-            self.on.has_group_address(group_address)
+        return group_address.raw in self._remote_values_by_address
        
     @property
     def is_on(self):
@@ -166,99 +206,50 @@ class KTSClimate(Device):
         """Set the operation mode of a thermostat. Send new operation_mode to BUS and update internal state."""
         if not self.supports_operation_mode:
             raise DeviceIllegalValue("operation mode not supported", operation_mode)
-
-        if operation_mode == 'Cool':
-            await self.operation_mode.set(1)
-        if operation_mode == 'Heat':
-            await self.operation_mode.set(4)
-        if operation_mode == 'Fan':
-            await self.operation_mode.set(3)
-        if operation_mode == 'Dry':
-            await self.operation_mode.set(2)            
-        # if operation_mode == 'Auto':
-        #     await self.operation_mode.set(-1)
+        value = self._operation_modes_inv.get(operation_mode)
+        if value is None:
+            raise DeviceIllegalValue("operation mode not configured", operation_mode)
+        await self.operation_mode.set(value)
 
     def get_supported_operation_modes(self):
         """Return all configured operation modes."""
-        if not self.supports_operation_mode:
-            return []
-        else:
-            return ['Cool', 'Heat', 'Fan', 'Dry']
+        return self._supported_operation_modes
 
     def get_operation_mode(self):
-        """Return current operation mode."""
+        """Return current operation mode, None if raw value is unknown."""
         if not self.supports_operation_mode:
             return None
-        else:
-            val = self.operation_mode.value
-            if val == 1:
-                return 'Cool'
-            if val == 4:
-                return 'Heat'
-            if val == 3:
-                return 'Fan'
-            if val == 2:
-                return 'Dry'
-            # if val == -1:
-            #     return 'Auto'
-            return 'Cool'
+        return self._operation_modes.get(self.operation_mode.value)
 
     async def set_fan_mode(self, fan_mode):
         """Set the fan mode of a thermostat. Send new fan_mode to BUS and update internal state."""
         if not self.supports_fan_mode:
             raise DeviceIllegalValue("fan mode not supported", fan_mode)
-
-        if fan_mode == 'Low':
-            await self.fan_mode.set(1)
-        if fan_mode == 'Medium':
-            await self.fan_mode.set(2)
-        if fan_mode == 'High':
-            await self.fan_mode.set(3)            
-        if fan_mode == 'Auto':
-            await self.fan_mode.set(4)
+        value = self._fan_modes_inv.get(fan_mode)
+        if value is None:
+            raise DeviceIllegalValue("fan mode not configured", fan_mode)
+        await self.fan_mode.set(value)
 
     def get_supported_fan_modes(self):
         """Return all configured fan modes."""
-        if not self.supports_fan_mode:
-            return []
-        else:
-            return ['Low', 'Medium', 'High', 'Auto']
+        return self._supported_fan_modes
 
     def get_fan_mode(self):
+        """Return current fan mode, None if raw value is unknown."""
         if not self.supports_fan_mode:
             return None
-        else:
-            val = self.fan_mode.value
-            if val == 1:
-                return 'Low'
-            if val == 2:
-                return 'Medium'
-            if val == 3:
-                return 'High'
-            if val == 4:
-                return 'Auto'
-            return 'Auto'
+        return self._fan_modes.get(self.fan_mode.value)
 
     async def process_group_write(self, telegram):
         """Process incoming GROUP WRITE telegram."""
-        await self.temperature.process(telegram)
-        await self.target_temperature.process(telegram)
-        await self.operation_mode.process(telegram)
-        await self.fan_mode.process(telegram)
-        await self.on.process(telegram)
+        remote_value = self._remote_values_by_address.get(
+            telegram.group_address.raw)
+        if remote_value is not None:
+            await remote_value.process(telegram)
 
     def state_addresses(self):
         """Return group addresses which should be requested to sync state."""
-        state_addresses = []
-        state_addresses.extend(self.temperature.state_addresses())
-        state_addresses.extend(self.target_temperature.state_addresses())
-        state_addresses.extend(self.on.state_addresses())
-        if self.supports_operation_mode:
-            state_addresses.extend(self.operation_mode.state_addresses())
-        if self.supports_fan_mode:
-            state_addresses.extend(self.fan_mode.state_addresses())
-            # Note: telegrams setting splitted up operation modes are not yet implemented
-        return state_addresses
+        return self._state_addresses
 
     def __str__(self):
         """Return object as readable string."""
@@ -9,7 +9,10 @@ It provides functionality for
 
 Modified by Haifeng for KTS smart solution in Guohao Changfeng Residence
     Added updown state support (closed or open)
+    Added online calibration of travel times from end position feedback
+    Added scheduled stop for positioning without position address
 """
+from xknx.exceptions import CouldNotParseTelegram
 from xknx.devices.device import Device
 from xknx.devices.remote_value_scaling import RemoteValueScaling
 from xknx.devices.remote_value_updown import RemoteValueUpDown
@@ -28,6 +31,20 @@ class KTSCover(Device):
     DEFAULT_TRAVEL_TIME_DOWN = 22
     DEFAULT_TRAVEL_TIME_UP = 22
 
+    # Allow DTP 1.00x to be processed, more flexible for old KNX devices.
+    # Shared payloads, remote values never modify a payload in place.
+    BINARY_SCALING_PAYLOADS = {0: DPTArray(0), 1: DPTArray(255)}
+
+    # Weight of a new measurement within the running travel time estimate
+    CALIBRATION_WEIGHT = 0.3
+
+    # Position feedback earlier than this after starting is an actuator
+    # echoing its target, not the end of the travel
+    CALIBRATION_MIN_TIME = 1
+
+    # Weight of a new measurement within the running bus latency estimate
+    BUS_LATENCY_WEIGHT = 0.3
+
     def __init__(self,
                  xknx,
                  name,
@@ -41,6 +58,8 @@ class KTSCover(Device):
                  travel_time_up=DEFAULT_TRAVEL_TIME_UP,
                  invert_position=False,
                  invert_angle=False,
+                 calibrate_travel_time=False,
+                 stop_latency=0,
                  device_updated_cb=None):
         """Initialize Cover class."""
         # pylint: disable=too-many-arguments
@@ -84,6 +103,16 @@ class KTSCover(Device):
             range_from=angle_range_from,
             range_to=angle_range_to)
 
+        # Route incoming telegrams by raw group address to the remote value
+        # owning it, position wins if it shares an address with angle.
+        self._remote_values_by_address = {}
+        for remote_value in (self.angle, self.position):
+            for group_address in (remote_value.group_address,
+                                  remote_value.group_address_state):
+                if group_address is not None:
+                    self._remote_values_by_address[group_address.raw] = \
+                        remote_value
+
         self.travel_time_down = travel_time_down
         self.travel_time_up = travel_time_up
 
@@ -91,6 +120,16 @@ class KTSCover(Device):
             travel_time_down,
             travel_time_up)
 
+        self.calibrate_travel_time = calibrate_travel_time
+        self.travel_time_calibrated_cb = None
+        self._calibration = None
+
+        # Actuator reaction time, the bus latency is measured
+        self.stop_latency = stop_latency
+        self.bus_latency = 0
+        self._scheduled_stop = None
+        self._auto_stop_pending = False
+
     @classmethod
     def from_config(cls, xknx, name, config):
         """Initialize object from configuration structure."""
@@ -114,6 +153,10 @@ class KTSCover(Device):
             config.get('invert_position', False)
         invert_angle = \
             config.get('invert_angle', False)
+        calibrate_travel_time = \
+            config.get('calibrate_travel_time', False)
+        stop_latency = \
+            config.get('stop_latency', 0)
 
         return cls(
             xknx,
@@ -127,7 +170,9 @@ class KTSCover(Device):
             travel_time_down=travel_time_down,
             travel_time_up=travel_time_up,
             invert_position=invert_position,
-            invert_angle=invert_angle)
+            invert_angle=invert_angle,
+            calibrate_travel_time=calibrate_travel_time,
+            stop_latency=stop_latency)
 
     def has_group_address(self, group_address):
         """Test if device has given group address."""
@@ -156,12 +201,16 @@ class KTSCover(Device):
 
     async def set_down(self):
         """Move cover down."""
+        self.cancel_scheduled_stop()
         await self.updown.down()
+        self.start_calibration(self.travelcalculator.position_closed)
         self.travelcalculator.start_travel_down()
 
     async def set_up(self):
         """Move cover up."""
+        self.cancel_scheduled_stop()
         await self.updown.up()
+        self.start_calibration(self.travelcalculator.position_open)
         self.travelcalculator.start_travel_up()
 
     async def set_short_down(self):
@@ -175,19 +224,29 @@ class KTSCover(Device):
     async def stop(self):
         """Stop cover."""
         # Thats the KNX way of doing this. electrical engineers ... m-)
+        self.cancel_scheduled_stop()
         await self.step.increase()
+        self._calibration = None
         self.travelcalculator.stop()
 
     async def set_position(self, position):
         """Move cover to a desginated postion."""
+        self.cancel_scheduled_stop()
+        self._calibration = None
         # No direct positioning group address defined
         if not self.position.group_address:
             current_position = self.current_position()
+            if position == current_position:
+                # Target reached, nothing to move and nothing to stop
+                if self.is_traveling():
+                    await self.stop()
+                return
             if position < current_position:
                 await self.updown.down()
             elif position > current_position:
                 await self.updown.up()
             self.travelcalculator.start_travel(position)
+            self.schedule_stop()
             return
 
         await self.position.set(position)
@@ -208,12 +267,45 @@ class KTSCover(Device):
         # unless device was traveling to fully open
         # or fully closed state
         if (
+                self._auto_stop_pending and
                 not self.position.group_address and
                 self.position_reached() and
                 not self.is_open() and
                 not self.is_closed()):
             await self.stop()
 
+    def schedule_stop(self):
+        """Arm a timer stopping the cover at its designated position."""
+        calculator = self.travelcalculator
+        if calculator.travel_to_position in (calculator.position_open,
+                                             calculator.position_closed):
+            # Actuator stops at end positions by itself
+            return
+        self._auto_stop_pending = True
+        # Stop telegram has to pass the queue and the actuator reacts late
+        delay = self.travel_time_remaining() \
+            - self.bus_latency - self.stop_latency
+        self._scheduled_stop = self.xknx.loop.call_later(
+            max(0, delay), self._scheduled_stop_due)
+
+    def cancel_scheduled_stop(self):
+        """Cancel a scheduled stop, e.g. for a new command."""
+        self._auto_stop_pending = False
+        if self._scheduled_stop is not None:
+            self._scheduled_stop.cancel()
+            self._scheduled_stop = None
+
+    def _scheduled_stop_due(self):
+        """Send stop telegram when the scheduled stop is due."""
+        self._scheduled_stop = None
+        self._auto_stop_pending = False
+        # Telegrams ahead of the stop telegram delay it by the rate limit
+        bus_latency = self.xknx.telegrams.qsize() / self.xknx.rate_limit
+        self.bus_latency += \
+            self.BUS_LATENCY_WEIGHT * (bus_latency - self.bus_latency)
+        # Travel calculator keeps running until the cover really stopped
+        self.xknx.loop.create_task(self.step.increase())
+
     async def do(self, action):
         """Execute 'do' commands."""
         if action == "up":
@@ -239,18 +331,82 @@ class KTSCover(Device):
 
     async def process_group_write(self, telegram):
         """Process incoming GROUP WRITE telegram."""
-        # Allow DTP 1.00x to be processed, more flexible for old KNX devices
-        if isinstance(telegram.payload, DPTBinary):
-            if(telegram.payload.value==1):
-                telegram.payload.value=255
-            telegram.payload=DPTArray(telegram.payload.value)
-
-        position_processed = await self.position.process(telegram)
-        if position_processed:
+        remote_value = self._remote_values_by_address.get(
+            telegram.group_address.raw)
+        if remote_value is None:
+            return
+
+        # The telegram is shared with other devices and must not be modified
+        payload = telegram.payload
+        if isinstance(payload, DPTBinary):
+            # Other binary values are taken as the raw scaling value
+            binary_value = payload.value
+            payload = self.BINARY_SCALING_PAYLOADS.get(binary_value)
+            if payload is None:
+                payload = DPTArray(binary_value)
+        if not remote_value.payload_valid(payload):
+            raise CouldNotParseTelegram("payload invalid",
+                                        payload=telegram.payload,
+                                        group_address=telegram.group_address,
+                                        device_name=self.name)
+        updated = remote_value.payload != payload
+        remote_value.payload = payload
+
+        if remote_value is self.position:
+            self.finish_calibration(self.position.value)
             self.travelcalculator.set_position(self.position.value)
             await self.after_update()
+        elif updated:
+            await self.after_update()
 
-        await self.angle.process(telegram)
+    def set_travel_times(self, travel_time_down, travel_time_up):
+        """Set travel times used for predicting the position."""
+        self.travel_time_down = travel_time_down
+        self.travel_time_up = travel_time_up
+        self.travelcalculator.travel_time_down = travel_time_down
+        self.travelcalculator.travel_time_up = travel_time_up
+
+    def start_calibration(self, end_position):
+        """Start measuring a full travel towards end_position."""
+        self._calibration = None
+        if not self.calibrate_travel_time:
+            return
+        calculator = self.travelcalculator
+        # Only full travels starting at the opposite end are measured
+        opposite_position = \
+            calculator.position_open + calculator.position_closed - end_position
+        if calculator.current_position() != opposite_position:
+            return
+        self._calibration = (end_position, calculator.current_time())
+
+    def finish_calibration(self, position):
+        """Update travel time estimate with a measured full travel."""
+        if self._calibration is None:
+            return
+        end_position, started = self._calibration
+        if position != end_position:
+            # Intermediate feedback while moving, wait for the end position
+            return
+        measured = self.travelcalculator.current_time() - started
+        if measured < self.CALIBRATION_MIN_TIME:
+            return
+        self._calibration = None
+        down = end_position == self.travelcalculator.position_closed
+        estimate = self.travel_time_down if down else self.travel_time_up
+        if measured > estimate * 2:
+            self.xknx.logger.debug(
+                "Ignoring travel time %.1f s of %s", measured, self.get_name())
+            return
+        # A much shorter travel converges over several measurements
+        measured = max(measured, estimate / 2)
+        estimate = round(
+            estimate + self.CALIBRATION_WEIGHT * (measured - estimate), 1)
+        if down:
+            self.set_travel_times(estimate, self.travel_time_up)
+        else:
+            self.set_travel_times(self.travel_time_down, estimate)
+        if self.travel_time_calibrated_cb is not None:
+            self.travel_time_calibrated_cb(self)
 
     def current_position(self):
         """Return current position of cover."""
@@ -264,6 +420,20 @@ class KTSCover(Device):
         """Return if cover is traveling at the moment."""
         return self.travelcalculator.is_traveling()
 
+    def travel_time_remaining(self):
+        """Return seconds until cover reaches its designated position."""
+        calculator = self.travelcalculator
+        if not calculator.is_traveling():
+            return 0
+        relative_position = \
+            calculator.travel_to_position - calculator.last_known_position
+        travel_time_full = calculator.travel_time_up \
+            if relative_position > 0 else calculator.travel_time_down
+        travel_range = calculator.position_open - calculator.position_closed
+        travel_time = travel_time_full * abs(relative_position) / travel_range
+        return max(0, calculator.travel_started_time + travel_time
+                   - calculator.current_time())
+
     def position_reached(self):
         """Return if cover has reached its final position."""
         return self.travelcalculator.position_reached()
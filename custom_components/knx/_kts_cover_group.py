@@ -0,0 +1,204 @@
+"""
+Module for moving a group of KTS covers with one command.
+
+It provides functionality for
+
+* moving all covers up/down with a central group address if available,
+  otherwise with one burst of telegrams to the member covers.
+* predicting the position of every member cover locally.
+"""
+from xknx.devices.device import Device
+from xknx.devices.remote_value_updown import RemoteValueUpDown
+from xknx.devices.remote_value_step import RemoteValueStep
+
+
+class KTSCoverGroup(Device):
+    """Class for managing a group of covers."""
+
+    def __init__(self,
+                 xknx,
+                 name,
+                 members,
+                 group_address_long=None,
+                 group_address_short=None,
+                 device_updated_cb=None):
+        """Initialize CoverGroup class."""
+        # pylint: disable=too-many-arguments
+        super(KTSCoverGroup, self).__init__(xknx, name, device_updated_cb)
+
+        # Members are resolved by name, they may be added after the group
+        self.member_names = members
+
+        self.updown = RemoteValueUpDown(
+            xknx,
+            group_address=group_address_long,
+            device_name=self.name)
+
+        self.step = RemoteValueStep(
+            xknx,
+            group_address_short,
+            device_name=self.name)
+
+    @property
+    def members(self):
+        """Return the member covers known to xknx."""
+        return [self.xknx.devices[name] for name in self.member_names
+                if name in self.xknx.devices]
+
+    def has_group_address(self, group_address):
+        """Test if device has given group address."""
+        return self.updown.has_group_address(group_address) \
+            or self.step.has_group_address(group_address)
+
+    def __str__(self):
+        """Return object as readable string."""
+        return '<CoverGroup name="{0}" ' \
+            'members="{1}" ' \
+            'updown="{2}" ' \
+            'step="{3}" />' \
+            .format(
+                self.name,
+                self.member_names,
+                self.updown.group_addr_str(),
+                self.step.group_addr_str())
+
+    async def set_down(self):
+        """Move all covers down."""
+        members = self.members
+        for member in members:
+            member.cancel_scheduled_stop()
+        if self.updown.writable:
+            await self.updown.down()
+        else:
+            for member in members:
+                await member.updown.down()
+        for member in members:
+            member.start_calibration(member.travelcalculator.position_closed)
+            member.travelcalculator.start_travel_down()
+        await self._members_updated(members)
+
+    async def set_up(self):
+        """Move all covers up."""
+        members = self.members
+        for member in members:
+            member.cancel_scheduled_stop()
+        if self.updown.writable:
+            await self.updown.up()
+        else:
+            for member in members:
+                await member.updown.up()
+        for member in members:
+            member.start_calibration(member.travelcalculator.position_open)
+            member.travelcalculator.start_travel_up()
+        await self._members_updated(members)
+
+    async def stop(self):
+        """Stop all covers."""
+        members = self.members
+        for member in members:
+            member.cancel_scheduled_stop()
+        if self.step.writable:
+            await self.step.increase()
+        else:
+            for member in members:
+                await member.step.increase()
+        for member in members:
+            member.travelcalculator.stop()
+        await self._members_updated(members)
+
+    async def set_position(self, position):
+        """Move all covers to a desginated postion."""
+        # Direction depends on the position of each cover
+        members = self.members
+        for member in members:
+            await member.set_position(position)
+        await self._members_updated(members)
+
+    async def set_angle(self, angle):
+        """Move covers to designated angle."""
+        self.xknx.logger.warning('Angle not supported for device %s', self.get_name())
+
+    async def auto_stop_if_necessary(self):
+        """Do auto stop of member covers if necessary."""
+        members = self.members
+        for member in members:
+            await member.auto_stop_if_necessary()
+        await self._members_updated(members)
+
+    async def _members_updated(self, members):
+        """Execute callbacks of members after positions were predicted."""
+        for member in members:
+            await member.after_update()
+        await self.after_update()
+
+    async def do(self, action):
+        """Execute 'do' commands."""
+        if action == "up":
+            await self.set_up()
+        elif action == "down":
+            await self.set_down()
+        elif action == "stop":
+            await self.stop()
+        else:
+            self.xknx.logger.warning("Could not understand action %s for device %s", action, self.get_name())
+
+    async def process_group_write(self, telegram):
+        """Process incoming GROUP WRITE telegram."""
+        # A central telegram (e.g. from a wall switch) moves all members
+        if not await self.updown.process(telegram):
+            return
+        members = self.members
+        for member in members:
+            member.cancel_scheduled_stop()
+            if self.updown.value == RemoteValueUpDown.Direction.DOWN:
+                member.travelcalculator.start_travel_down()
+            else:
+                member.travelcalculator.start_travel_up()
+        await self._members_updated(members)
+
+    def current_position(self):
+        """Return average position of member covers."""
+        positions = [member.current_position() for member in self.members]
+        if not positions:
+            return None
+        return int(sum(positions) / len(positions))
+
+    def current_angle(self):
+        """Return current tilt angle of covers."""
+        # pylint: disable=no-self-use
+        return None
+
+    def is_traveling(self):
+        """Return if any cover is traveling at the moment."""
+        return any(member.is_traveling() for member in self.members)
+
+    def travel_time_remaining(self):
+        """Return seconds until all covers reached their positions."""
+        return max((member.travel_time_remaining()
+                    for member in self.members), default=0)
+
+    def position_reached(self):
+        """Return if all covers have reached their final positions."""
+        return all(member.position_reached() for member in self.members)
+
+    def is_open(self):
+        """Return if all covers are open."""
+        return all(member.is_open() for member in self.members)
+
+    def is_closed(self):
+        """Return if all covers are closed."""
+        return all(member.is_closed() for member in self.members)
+
+    @property
+    def supports_position(self):
+        """Return if covers support direct positioning."""
+        return False
+
+    @property
+    def supports_angle(self):
+        """Return if covers support tilt angle."""
+        return False
+
+    def __eq__(self, other):
+        """Equal operator."""
+        return self.__dict__ == other.__dict__
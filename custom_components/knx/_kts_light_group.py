@@ -0,0 +1,118 @@
+"""
+Module for switching a group of KNX lights with one command.
+
+It provides functionality for
+
+* switching all lights on/off with a central group address if available,
+  otherwise with one burst of telegrams to the member lights.
+* updating the state of every member light optimistically and reading
+  the actual states of the members from the bus afterwards.
+"""
+from xknx.devices.device import Device
+from xknx.devices.remote_value_switch import RemoteValueSwitch
+from xknx.knx import Telegram, TelegramType
+
+
+class KTSLightGroup(Device):
+    """Class for managing a group of lights."""
+
+    def __init__(self,
+                 xknx,
+                 name,
+                 members,
+                 group_address_switch=None,
+                 device_updated_cb=None):
+        """Initialize LightGroup class."""
+        # pylint: disable=too-many-arguments
+        super(KTSLightGroup, self).__init__(xknx, name, device_updated_cb)
+
+        # Members are resolved by name, they may be added after the group
+        self.member_names = members
+
+        self.switch = RemoteValueSwitch(
+            xknx,
+            group_address_switch,
+            device_name=self.name)
+
+    @property
+    def members(self):
+        """Return the member lights known to xknx."""
+        return [self.xknx.devices[name] for name in self.member_names
+                if name in self.xknx.devices]
+
+    def has_group_address(self, group_address):
+        """Test if device has given group address."""
+        return self.switch.has_group_address(group_address)
+
+    def __str__(self):
+        """Return object as readable string."""
+        return '<LightGroup name="{0}" ' \
+            'members="{1}" ' \
+            'switch="{2}" />' \
+            .format(
+                self.name,
+                self.member_names,
+                self.switch.group_addr_str())
+
+    @property
+    def state(self):
+        """Return if any light of the group is on."""
+        return any(member.state for member in self.members)
+
+    async def set_on(self):
+        """Switch all lights on."""
+        await self._switch(True)
+
+    async def set_off(self):
+        """Switch all lights off."""
+        await self._switch(False)
+
+    async def _switch(self, value):
+        """Switch all lights with one telegram or one burst."""
+        members = self.members
+        if self.switch.writable:
+            await self.switch.set(value)
+        else:
+            # Queue the telegrams of all members back to back
+            telegrams = [
+                Telegram(member.switch.group_address,
+                         payload=member.switch.to_knx(value))
+                for member in members if member.switch.writable]
+            for telegram in telegrams:
+                await self.xknx.telegrams.put(telegram)
+        await self._members_switched(members, value)
+
+    async def _members_switched(self, members, value):
+        """Update the state of members without waiting for the actuators."""
+        for member in members:
+            member.switch.payload = member.switch.to_knx(value)
+            await member.after_update()
+        await self.after_update()
+        # Actuators which missed the telegram or do not listen to the central
+        # address correct the optimistic state with their responses. The
+        # reads are queued behind the writes of the burst, members without
+        # a state address keep the optimistic state.
+        for member in members:
+            for group_address in member.switch.state_addresses():
+                await self.xknx.telegrams.put(
+                    Telegram(group_address, TelegramType.GROUP_READ))
+
+    async def do(self, action):
+        """Execute 'do' commands."""
+        if action == "on":
+            await self.set_on()
+        elif action == "off":
+            await self.set_off()
+        else:
+            self.xknx.logger.warning("Could not understand action %s for device %s", action, self.get_name())
+
+    async def process_group_write(self, telegram):
+        """Process incoming GROUP WRITE telegram."""
+        # A central telegram (e.g. from a wall switch) switches all members
+        if not await self.switch.process(telegram):
+            return
+        await self._members_switched(self.members, bool(self.switch.value))
+
+    def __eq__(self, other):
+        """Equal operator."""
+        return self.__dict__ == other.__dict__
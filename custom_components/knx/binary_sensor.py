@@ -2,11 +2,18 @@
 import voluptuous as vol
 from xknx.devices import BinarySensor
 
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX, KNXAutomation
 from homeassistant.components.binary_sensor import PLATFORM_SCHEMA, BinarySensorDevice
 from homeassistant.const import CONF_DEVICE_CLASS, CONF_NAME
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from . import (
+    ATTR_DISCOVER_DEVICES,
+    DATA_KNX,
+    SIGNAL_KNX_CONNECTION_STATE,
+    KNXAutomation,
+)
 
 
 CONF_STATE_ADDRESS = "state_address"
@@ -116,10 +123,13 @@ class KNXBinarySensor(BinarySensorDevice):
 
         async def after_update_callback(device):
             """Call after device was updated."""
-            await self.async_update_ha_state()
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
 
         self.device.register_device_updated_cb(after_update_callback)
 
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
+
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
@@ -8,12 +8,19 @@ Modified by Haifeng for KTS smart solution in Guohao Changfeng Residence
  - Floor heating: temperature, target_temperature, on_off
 """
 
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timedelta
+
 import voluptuous as vol
 
 from ._kts_climate import KTSClimate
 
 from homeassistant.components.climate import PLATFORM_SCHEMA, ClimateDevice
 from homeassistant.components.climate.const import (
+    HVAC_MODE_AUTO,
     HVAC_MODE_DRY, 
     HVAC_MODE_FAN_ONLY, 
     HVAC_MODE_HEAT, 
@@ -21,10 +28,22 @@ from homeassistant.components.climate.const import (
     HVAC_MODE_OFF, 
     SUPPORT_TARGET_TEMPERATURE,
     SUPPORT_FAN_MODE)
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX
-from homeassistant.const import ATTR_TEMPERATURE, CONF_NAME, TEMP_CELSIUS, STATE_UNKNOWN
+from homeassistant.const import (
+    ATTR_ENTITY_ID, ATTR_TEMPERATURE, CONF_NAME, TEMP_CELSIUS, STATE_UNKNOWN,
+    WEEKDAYS)
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+import homeassistant.util.dt as dt_util
+
+from . import (
+    ATTR_DISCOVER_DEVICES,
+    DATA_KNX,
+    DOMAIN,
+    SIGNAL_KNX_CONNECTION_STATE,
+)
+
+_LOGGER = logging.getLogger(__name__)
 
 CONF_TARGET_TEMPERATURE_STEP = 'target_temperature_step'
 CONF_TARGET_TEMPERATURE_MAX = 'target_temperature_max'
@@ -38,11 +57,42 @@ CONF_FAN_MODE_ADDRESS = 'fan_mode_address'
 CONF_FAN_MODE_STATE_ADDRESS = 'fan_mode_state_address'
 CONF_ON_OFF_ADDRESS = 'on_off_address'
 CONF_ON_OFF_STATE_ADDRESS = 'on_off_state_address'
+CONF_OPERATION_MODES = 'operation_modes'
+CONF_FAN_MODES = 'fan_modes'
+CONF_SETPOINT_DEBOUNCE = 'setpoint_debounce'
+CONF_SCHEDULE = 'schedule'
+CONF_DAYS = 'days'
+CONF_AT = 'at'
+CONF_TEMPERATURE = 'temperature'
+
+DATA_KNX_CLIMATES = 'data_knx_climates'
+DATA_KNX_CLIMATE_SCHEDULE = 'data_knx_climate_schedule'
+
+SERVICE_KNX_SET_ZONE_TEMPERATURE = 'set_zone_temperature'
 
 DEFAULT_NAME = 'KTS Climate'
 DEFAULT_TARGET_TEMPERATURE_STEP = 0.5
 DEFAULT_TARGET_TEMPERATURE_MAX = 30
 DEFAULT_TARGET_TEMPERATURE_MIN = 5
+DEFAULT_SETPOINT_DEBOUNCE = 1.0
+
+# Map KTS operation modes to HA modes. 
+OPERATION_MODES = {
+    "Cool": HVAC_MODE_COOL,
+    "Heat": HVAC_MODE_HEAT,
+    "Fan": HVAC_MODE_FAN_ONLY,
+    "Dry": HVAC_MODE_DRY,
+    "Auto": HVAC_MODE_AUTO,
+}
+
+OPERATION_MODES_INV = dict((
+    reversed(item) for item in OPERATION_MODES.items()))
+
+SCHEDULE_SCHEMA = vol.Schema({
+    vol.Optional(CONF_DAYS, default=WEEKDAYS): cv.weekdays,
+    vol.Required(CONF_AT): cv.time,
+    vol.Required(CONF_TEMPERATURE): vol.Coerce(float),
+})
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
@@ -62,35 +112,63 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_FAN_MODE_STATE_ADDRESS): cv.string,
     vol.Optional(CONF_ON_OFF_ADDRESS): cv.string,
     vol.Optional(CONF_ON_OFF_STATE_ADDRESS): cv.string,
+    # Raw KNX value to KTS mode name, e.g. {1: Cool, 4: Heat}
+    vol.Optional(CONF_OPERATION_MODES):
+        {vol.Coerce(int): vol.In(OPERATION_MODES)},
+    vol.Optional(CONF_FAN_MODES): {vol.Coerce(int): cv.string},
+    vol.Optional(CONF_SETPOINT_DEBOUNCE, default=DEFAULT_SETPOINT_DEBOUNCE):
+        vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+    # Weekly profile, e.g. [{days: [mon, tue], at: '06:30', temperature: 22}]
+    vol.Optional(CONF_SCHEDULE): vol.All(cv.ensure_list, [SCHEDULE_SCHEMA]),
     })
 
-# Map KTS operation modes to HA modes. 
-OPERATION_MODES = {
-    "Cool": HVAC_MODE_COOL,
-    "Heat": HVAC_MODE_HEAT,
-    "Fan": HVAC_MODE_FAN_ONLY,
-    "Dry": HVAC_MODE_DRY
-}
-
-OPERATION_MODES_INV = dict((
-    reversed(item) for item in OPERATION_MODES.items()))
+SERVICE_KNX_SET_ZONE_TEMPERATURE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_TEMPERATURE): vol.Coerce(float),
+})
 
 async def async_setup_platform(hass, config, async_add_entities,
                                discovery_info=None):
     """Set up climate(s) for KNX platform."""
+    async_register_services(hass)
     if discovery_info is not None:
         async_add_entities_discovery(hass, discovery_info, async_add_entities)
     else:
         async_add_entities_config(hass, config, async_add_entities)
 
 
+@callback
+def async_register_services(hass):
+    """Register services for setting many KNX climates at once."""
+    if hass.services.has_service(DOMAIN, SERVICE_KNX_SET_ZONE_TEMPERATURE):
+        return
+    hass.data[DATA_KNX_CLIMATES] = {}
+
+    async def async_set_zone_temperature(call):
+        """Send one setpoint to many climate zones in a single burst."""
+        temperature = call.data[ATTR_TEMPERATURE]
+        climates = []
+        for entity_id in call.data[ATTR_ENTITY_ID]:
+            climate = hass.data[DATA_KNX_CLIMATES].get(entity_id)
+            if climate is None:
+                _LOGGER.warning("%s is not a KNX climate", entity_id)
+                continue
+            climates.append(climate)
+        await asyncio.gather(*[climate.async_set_temperature_now(temperature)
+                               for climate in climates])
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_KNX_SET_ZONE_TEMPERATURE, async_set_zone_temperature,
+        schema=SERVICE_KNX_SET_ZONE_TEMPERATURE_SCHEMA)
+
+
 @callback
 def async_add_entities_discovery(hass, discovery_info, async_add_entities):
     """Set up climates for KNX platform configured within platform."""
     entities = []
     for device_name in discovery_info[ATTR_DISCOVER_DEVICES]:
         device = hass.data[DATA_KNX].xknx.devices[device_name]
-        entities.append(KNXClimate(hass, device))
+        entities.append(KNXClimate(device))
     async_add_entities(entities)
 
 
@@ -115,18 +193,41 @@ def async_add_entities_config(hass, config, async_add_entities):
         group_address_fan_mode=config.get(CONF_FAN_MODE_ADDRESS),
         group_address_fan_mode_state=config.get(CONF_FAN_MODE_STATE_ADDRESS),
         group_address_on_off=config.get(CONF_ON_OFF_ADDRESS),
-        group_address_on_off_state=config.get(CONF_ON_OFF_STATE_ADDRESS))
+        group_address_on_off_state=config.get(CONF_ON_OFF_STATE_ADDRESS),
+        operation_modes=config.get(CONF_OPERATION_MODES),
+        fan_modes=config.get(CONF_FAN_MODES))
     hass.data[DATA_KNX].xknx.devices.add(climate)
-    async_add_entities([KNXClimate(climate)])
+    schedule = None
+    if CONF_SCHEDULE in config:
+        schedule = [(WEEKDAYS.index(day), entry[CONF_AT],
+                     entry[CONF_TEMPERATURE])
+                    for entry in config[CONF_SCHEDULE]
+                    for day in entry[CONF_DAYS]]
+    async_add_entities([
+        KNXClimate(climate, config.get(CONF_SETPOINT_DEBOUNCE), schedule)])
 
 
 class KNXClimate(ClimateDevice):
     """Representation of a KNX climate device."""
 
-    def __init__(self, device):
+    def __init__(self, device, setpoint_debounce=DEFAULT_SETPOINT_DEBOUNCE,
+                 schedule=None):
         """Initialize of a KNX climate device."""
         self.device = device
+        self._schedule = schedule
         self._unit_of_measurement = TEMP_CELSIUS
+        self._setpoint_debounce = setpoint_debounce
+        self._pending_target_temperature = None
+        self._setpoint_handle = None
+
+        # Supported modes are fixed by configuration
+        self._hvac_modes = [OPERATION_MODES.get(mode) for mode in
+                            device.get_supported_operation_modes()]
+        if device.supports_on_off:
+            # Without operation modes, heat is just "on"
+            if not device.supports_operation_mode:
+                self._hvac_modes.append(HVAC_MODE_HEAT)
+            self._hvac_modes.append(HVAC_MODE_OFF)
 
     @property
     def supported_features(self):
@@ -141,12 +242,21 @@ class KNXClimate(ClimateDevice):
         async def after_update_callback(device):
             """Call after device was updated."""
             # pylint: disable=unused-argument
-            await self.async_update_ha_state()
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
         self.device.register_device_updated_cb(after_update_callback)
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
 
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
+        climates = self.hass.data[DATA_KNX_CLIMATES]
+        climates[self.entity_id] = self
+        self.async_on_remove(
+            lambda entity_id=self.entity_id: climates.pop(entity_id, None))
+        if self._schedule:
+            self.async_on_remove(async_get_schedule_engine(
+                self.hass).async_add_zone(self, self._schedule))
     
     @property
     def name(self):
@@ -181,6 +291,8 @@ class KNXClimate(ClimateDevice):
     @property
     def target_temperature(self):
         """Return the temperature we try to reach."""
+        if self._pending_target_temperature is not None:
+            return self._pending_target_temperature
         return self.device.target_temperature.value
 
     @property
@@ -198,7 +310,34 @@ class KNXClimate(ClimateDevice):
         temperature = kwargs.get(ATTR_TEMPERATURE)
         if temperature is None:
             return
+        if not self._setpoint_debounce:
+            await self.async_set_temperature_now(temperature)
+            return
+        # Show the setpoint right away, only the last one of a burst
+        # (e.g. dragging the slider) is sent to the slow actuators.
+        self._pending_target_temperature = temperature
+        if self._setpoint_handle is not None:
+            self._setpoint_handle.cancel()
+        self._setpoint_handle = self.hass.loop.call_later(
+            self._setpoint_debounce, self._async_setpoint_due)
+        self.async_write_ha_state()
+
+    @callback
+    def _async_setpoint_due(self):
+        """Send the debounced setpoint."""
+        self._setpoint_handle = None
+        self.hass.async_create_task(
+            self.async_set_temperature_now(self._pending_target_temperature))
+
+    async def async_set_temperature_now(self, temperature):
+        """Send target temperature without debouncing."""
+        if self._setpoint_handle is not None:
+            self._setpoint_handle.cancel()
+            self._setpoint_handle = None
         await self.device.set_target_temperature(temperature)
+        if self._pending_target_temperature == temperature \
+                or self._setpoint_handle is None:
+            self._pending_target_temperature = None
         await self.async_update_ha_state()
 
     @property
@@ -206,22 +345,29 @@ class KNXClimate(ClimateDevice):
         """Return current operation ie. heat, cool, idle."""
         if self.device.supports_on_off and not self.device.is_on:
             return HVAC_MODE_OFF
+        if not self.device.supports_operation_mode:
+            return HVAC_MODE_HEAT
+        # Unknown raw modes are not reported as any mode
         kts_op_mode = self.device.get_operation_mode()
-        return OPERATION_MODES.get(kts_op_mode, HVAC_MODE_HEAT)
+        return OPERATION_MODES.get(kts_op_mode)
 
     @property
     def hvac_modes(self):
         """Return the list of available operation modes."""
-        kts_op_list = self.device.get_supported_operation_modes()
-        modes = [OPERATION_MODES.get(mode) for mode in kts_op_list]
-        if self.device.supports_on_off:
-            if HVAC_MODE_HEAT not in modes:
-                modes.append(HVAC_MODE_HEAT)
-            modes.append(HVAC_MODE_OFF)
-        return modes
+        return self._hvac_modes
 
     async def async_set_hvac_mode(self, hvac_mode):
         """Set operation mode."""
+        kts_op_mode = OPERATION_MODES_INV.get(hvac_mode)
+        if (
+                not (hvac_mode == HVAC_MODE_OFF
+                     and self.device.supports_on_off)
+                and self.device.supports_operation_mode
+                and kts_op_mode not in
+                self.device.get_supported_operation_modes()):
+            _LOGGER.warning("Operation mode %s is not configured for %s",
+                            hvac_mode, self.name)
+            return
         if self.device.supports_on_off:
             if hvac_mode == HVAC_MODE_OFF:
                 await self.device.turn_off()
@@ -229,7 +375,6 @@ class KNXClimate(ClimateDevice):
             else:
                 await self.device.turn_on()
         if self.device.supports_operation_mode:
-            kts_op_mode = OPERATION_MODES_INV.get(hvac_mode, None)
             await self.device.set_operation_mode(kts_op_mode)
             await self.async_update_ha_state()
 
@@ -262,3 +407,124 @@ class KNXClimate(ClimateDevice):
     async def async_turn_off(self):
         """Turn off."""
         await self.device.turn_off()
+
+
+@callback
+def async_get_schedule_engine(hass):
+    """Return the schedule engine shared by all KNX climates."""
+    if DATA_KNX_CLIMATE_SCHEDULE not in hass.data:
+        hass.data[DATA_KNX_CLIMATE_SCHEDULE] = ClimateScheduleEngine(hass)
+    return hass.data[DATA_KNX_CLIMATE_SCHEDULE]
+
+
+class ClimateScheduleEngine:
+    """Run the weekly setpoint profiles of all climate zones with one timer.
+
+    The upcoming transition of every zone is kept in a timeline sorted by
+    time. Only the earliest one is armed, transitions due at the same
+    instant are sent to the bus together.
+    """
+
+    def __init__(self, hass):
+        """Initialize the schedule engine."""
+        self.hass = hass
+        self._profiles = {}
+        self._timeline = []
+        self._sequence = itertools.count()
+        self._handle = None
+
+    @callback
+    def async_add_zone(self, climate, profile):
+        """Add a zone with a list of (weekday, time, temperature).
+
+        The setpoint which is currently due is sent right away, return a
+        function to remove the zone again.
+        """
+        now = dt_util.now()
+        self._profiles[climate] = profile
+        self._async_push_next(climate, now)
+        self._async_arm()
+        _, temperature = max(
+            (self._last_occurrence(weekday, at, now), temperature)
+            for weekday, at, temperature in profile)
+        self.hass.async_create_task(self._async_send([(climate, temperature)]))
+
+        @callback
+        def async_remove_zone():
+            """Remove the zone and its upcoming transition."""
+            self._profiles.pop(climate, None)
+            self._timeline = [item for item in self._timeline
+                              if item[2] is not climate]
+            heapq.heapify(self._timeline)
+            self._async_arm()
+
+        return async_remove_zone
+
+    @callback
+    def _async_push_next(self, climate, now):
+        """Put the next transition of a zone into the timeline."""
+        when, temperature = min(
+            (self._next_occurrence(weekday, at, now), temperature)
+            for weekday, at, temperature in self._profiles[climate])
+        heapq.heappush(self._timeline,
+                       (when, next(self._sequence), climate, temperature))
+
+    @staticmethod
+    def _occurrence(weekday, at, now, weeks=0):
+        """Return weekday at local time in the week starting at now as UTC."""
+        today = dt_util.as_local(now).date()
+        day = today + timedelta(
+            days=(weekday - today.weekday()) % 7 + 7 * weeks)
+        # Localized on the calendar day, so DST changes are taken into account
+        return dt_util.as_utc(datetime.combine(day, at))
+
+    @classmethod
+    def _next_occurrence(cls, weekday, at, now):
+        """Return the next datetime after now on weekday at time."""
+        when = cls._occurrence(weekday, at, now)
+        if when <= now:
+            when = cls._occurrence(weekday, at, now, 1)
+        return when
+
+    @classmethod
+    def _last_occurrence(cls, weekday, at, now):
+        """Return the last datetime up to now on weekday at time."""
+        when = cls._occurrence(weekday, at, now)
+        if when > now:
+            when = cls._occurrence(weekday, at, now, -1)
+        return when
+
+    @callback
+    def _async_arm(self):
+        """Arm the timer for the earliest transition."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._timeline:
+            return
+        delay = (self._timeline[0][0] - dt_util.now()).total_seconds()
+        self._handle = self.hass.loop.call_later(
+            max(delay, 0), self._async_transition_due)
+
+    @callback
+    def _async_transition_due(self):
+        """Send all transitions which are due."""
+        self._handle = None
+        now = dt_util.now()
+        batch = []
+        while self._timeline and self._timeline[0][0] <= now:
+            _, _, climate, temperature = heapq.heappop(self._timeline)
+            batch.append((climate, temperature))
+        for climate, _ in batch:
+            self._async_push_next(climate, now)
+        # Re-arms as well if the timer fired a bit early.
+        self._async_arm()
+        if batch:
+            self.hass.async_create_task(self._async_send(batch))
+
+    async def _async_send(self, batch):
+        """Send the setpoints of a batch of zones at once."""
+        _LOGGER.debug("Scheduled setpoints for %s",
+                      ", ".join(climate.entity_id for climate, _ in batch))
+        await asyncio.gather(*[climate.async_set_temperature_now(temperature)
+                               for climate, temperature in batch])
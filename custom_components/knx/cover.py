@@ -8,6 +8,7 @@ https://home-assistant.io/components/cover.knx/
 import voluptuous as vol
 
 from ._kts_cover import KTSCover
+from ._kts_cover_group import KTSCoverGroup
 
 from homeassistant.components.cover import (
     ATTR_POSITION, 
@@ -19,11 +20,19 @@ from homeassistant.components.cover import (
     SUPPORT_SET_TILT_POSITION,
     SUPPORT_STOP, 
     CoverDevice)
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX
 from homeassistant.const import CONF_NAME
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.event import async_track_utc_time_change
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
+
+from . import (
+    ATTR_DISCOVER_DEVICES,
+    CONF_KNX_COVER_UPDATE_INTERVAL,
+    DATA_KNX,
+    DOMAIN,
+    SIGNAL_KNX_CONNECTION_STATE,
+)
 
 CONF_MOVE_LONG_ADDRESS = 'move_long_address'
 CONF_MOVE_SHORT_ADDRESS = 'move_short_address'
@@ -35,6 +44,16 @@ CONF_TRAVELLING_TIME_DOWN = 'travelling_time_down'
 CONF_TRAVELLING_TIME_UP = 'travelling_time_up'
 CONF_INVERT_POSITION = 'invert_position'
 CONF_INVERT_ANGLE = 'invert_angle'
+CONF_MEMBERS = 'members'
+CONF_CALIBRATE_TRAVELLING_TIME = 'calibrate_travelling_time'
+CONF_STOP_LATENCY = 'stop_latency'
+
+DATA_KNX_COVER_TRAVEL = 'data_knx_cover_travel'
+DATA_KNX_COVER_TRAVEL_TIMES = 'data_knx_cover_travel_times'
+
+STORAGE_KEY = 'knx_cover_travel_times'
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 60
 
 DEFAULT_TRAVEL_TIME = 25
 DEFAULT_NAME = 'KTS Cover'
@@ -53,6 +72,10 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
         cv.positive_int,
     vol.Optional(CONF_INVERT_POSITION, default=False): cv.boolean,
     vol.Optional(CONF_INVERT_ANGLE, default=False): cv.boolean,
+    vol.Optional(CONF_MEMBERS): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(CONF_CALIBRATE_TRAVELLING_TIME, default=False): cv.boolean,
+    vol.Optional(CONF_STOP_LATENCY, default=0):
+        vol.All(vol.Coerce(float), vol.Range(min=0, max=2)),
 })
 
 
@@ -78,6 +101,10 @@ def async_add_entities_discovery(hass, discovery_info, async_add_entities):
 @callback
 def async_add_entities_config(hass, config, async_add_entities):
     """Set up cover for KNX platform configured within platform."""
+    if CONF_MEMBERS in config:
+        async_add_cover_group_config(hass, config, async_add_entities)
+        return
+
     cover = KTSCover(
         hass.data[DATA_KNX].xknx,
         name=config.get(CONF_NAME),
@@ -91,31 +118,54 @@ def async_add_entities_config(hass, config, async_add_entities):
         travel_time_down=config.get(CONF_TRAVELLING_TIME_DOWN),
         travel_time_up=config.get(CONF_TRAVELLING_TIME_UP),
         invert_position=config.get(CONF_INVERT_POSITION),
-        invert_angle=config.get(CONF_INVERT_ANGLE))
+        invert_angle=config.get(CONF_INVERT_ANGLE),
+        calibrate_travel_time=config.get(CONF_CALIBRATE_TRAVELLING_TIME),
+        stop_latency=config.get(CONF_STOP_LATENCY))
 
     hass.data[DATA_KNX].xknx.devices.add(cover)
     async_add_entities([KNXCover(cover)])
 
 
+@callback
+def async_add_cover_group_config(hass, config, async_add_entities):
+    """Set up cover group for KNX platform configured within platform."""
+    cover_group = KTSCoverGroup(
+        hass.data[DATA_KNX].xknx,
+        name=config.get(CONF_NAME),
+        members=config.get(CONF_MEMBERS),
+        group_address_long=config.get(CONF_MOVE_LONG_ADDRESS),
+        group_address_short=config.get(CONF_MOVE_SHORT_ADDRESS))
+
+    hass.data[DATA_KNX].xknx.devices.add(cover_group)
+    async_add_entities([KNXCover(cover_group)])
+
+
 class KNXCover(CoverDevice):
     """Representation of a KNX cover."""
 
     def __init__(self, device):
         """Initialize the cover."""
         self.device = device
-        self._unsubscribe_auto_updater = None
 
     @callback
     def async_register_callbacks(self):
         """Register callbacks to update hass after device was changed."""
         async def after_update_callback(device):
             """Call after device was updated."""
-            await self.async_update_ha_state()
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
         self.device.register_device_updated_cb(after_update_callback)
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
 
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
+        self.async_on_remove(
+            async_get_travel_scheduler(self.hass).async_register(self))
+        if getattr(self.device, 'calibrate_travel_time', False):
+            travel_times = async_get_travel_time_store(self.hass)
+            await travel_times.async_restore(self.device)
+            self.device.travel_time_calibrated_cb = travel_times.async_save
 
     @property
     def name(self):
@@ -190,21 +240,168 @@ class KNXCover(CoverDevice):
 
     def start_auto_updater(self):
         """Start the autoupdater to update HASS while cover is moving."""
-        if self._unsubscribe_auto_updater is None:
-            self._unsubscribe_auto_updater = async_track_utc_time_change(
-                self.hass, self.auto_updater_hook)
+        async_get_travel_scheduler(self.hass).async_track(self)
 
     def stop_auto_updater(self):
         """Stop the autoupdater."""
-        if self._unsubscribe_auto_updater is not None:
-            self._unsubscribe_auto_updater()
-            self._unsubscribe_auto_updater = None
+        async_get_travel_scheduler(self.hass).async_untrack(self)
+
+
+@callback
+def async_get_travel_scheduler(hass):
+    """Return the travel scheduler shared by all KNX covers."""
+    if DATA_KNX_COVER_TRAVEL not in hass.data:
+        update_interval = \
+            hass.data[DATA_KNX].config[DOMAIN][CONF_KNX_COVER_UPDATE_INTERVAL]
+        hass.data[DATA_KNX_COVER_TRAVEL] = \
+            CoverTravelScheduler(hass, update_interval)
+    return hass.data[DATA_KNX_COVER_TRAVEL]
+
+
+@callback
+def async_get_travel_time_store(hass):
+    """Return the store of calibrated travel times."""
+    if DATA_KNX_COVER_TRAVEL_TIMES not in hass.data:
+        hass.data[DATA_KNX_COVER_TRAVEL_TIMES] = CoverTravelTimeStore(hass)
+    return hass.data[DATA_KNX_COVER_TRAVEL_TIMES]
+
+
+def travel_time_remaining(device):
+    """Return seconds until a cover device reaches its target."""
+    if hasattr(device, 'travel_time_remaining'):
+        return device.travel_time_remaining()
+    # Plain xknx covers from xknx.yaml only have the travel calculator
+    calculator = device.travelcalculator
+    if not calculator.is_traveling():
+        return 0
+    relative_position = \
+        calculator.travel_to_position - calculator.last_known_position
+    travel_time_full = calculator.travel_time_up \
+        if relative_position > 0 else calculator.travel_time_down
+    travel_range = calculator.position_open - calculator.position_closed
+    travel_time = travel_time_full * abs(relative_position) / travel_range
+    return max(0, calculator.travel_started_time + travel_time
+               - calculator.current_time())
+
+
+class CoverTravelTimeStore:
+    """Persist calibrated travel times of KNX covers across restarts."""
+
+    def __init__(self, hass):
+        """Initialize the travel time store."""
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._travel_times = None
+
+    async def async_restore(self, device):
+        """Apply the stored travel times to device."""
+        if self._travel_times is None:
+            travel_times = await self._store.async_load()
+            if self._travel_times is None:
+                self._travel_times = travel_times or {}
+        travel_times = self._travel_times.get(device.name)
+        if travel_times is not None:
+            device.set_travel_times(
+                travel_times['travel_time_down'],
+                travel_times['travel_time_up'])
+
+    @callback
+    def async_save(self, device):
+        """Store the travel times of device."""
+        self._travel_times[device.name] = {
+            'travel_time_down': device.travel_time_down,
+            'travel_time_up': device.travel_time_up,
+        }
+        self._store.async_delay_save(
+            lambda: self._travel_times, STORAGE_SAVE_DELAY)
+
+
+class CoverTravelScheduler:
+    """Track travelling covers with timers instead of polling.
+
+    Every cover gets one timer at its calculated arrival for the auto stop.
+    Covers moved by a cover group are tracked with their own timers, as
+    they arrive earlier than the slowest member.
+    Intermediate positions of all travelling covers are published together
+    every update_interval seconds (never if 0).
+    """
+
+    def __init__(self, hass, update_interval):
+        """Initialize the travel scheduler."""
+        self.hass = hass
+        self.update_interval = update_interval
+        self._entities = {}
+        self._arrivals = {}
+        self._update_handle = None
+
+    @callback
+    def async_register(self, cover):
+        """Make a cover known to groups, return a function to forget it."""
+        self._entities[cover.device.name] = cover
+
+        @callback
+        def async_unregister():
+            """Forget the cover."""
+            self.async_untrack(cover)
+            self._entities.pop(cover.device.name, None)
+
+        return async_unregister
 
     @callback
-    def auto_updater_hook(self, now):
-        """Call for the autoupdater."""
-        self.async_schedule_update_ha_state()
-        if self.device.position_reached():
-            self.stop_auto_updater()
+    def async_track(self, cover):
+        """Track a cover which started travelling."""
+        self._async_cancel_arrival(cover)
+        self._arrivals[cover] = self.hass.loop.call_later(
+            travel_time_remaining(cover.device),
+            self._async_arrived, cover)
+        for member in self._member_entities(cover):
+            if member.device.is_traveling():
+                self.async_track(member)
+        if self._update_handle is None and self.update_interval:
+            self._update_handle = self.hass.loop.call_later(
+                self.update_interval, self._async_update_positions)
 
-        self.hass.add_job(self.device.auto_stop_if_necessary())
+    @callback
+    def async_untrack(self, cover):
+        """Stop tracking a cover."""
+        self._async_cancel_arrival(cover)
+        for member in self._member_entities(cover):
+            self._async_cancel_arrival(member)
+        if not self._arrivals and self._update_handle is not None:
+            self._update_handle.cancel()
+            self._update_handle = None
+
+    def _member_entities(self, cover):
+        """Return the entities of the members of a cover group."""
+        return [self._entities[member.name]
+                for member in getattr(cover.device, 'members', ())
+                if member.name in self._entities]
+
+    @callback
+    def _async_cancel_arrival(self, cover):
+        """Cancel the arrival timer of a cover."""
+        handle = self._arrivals.pop(cover, None)
+        if handle is not None:
+            handle.cancel()
+
+    @callback
+    def _async_arrived(self, cover):
+        """Handle a cover reaching its calculated position."""
+        remaining = travel_time_remaining(cover.device)
+        if remaining > 0:
+            # Timer fired a bit early compared to the wall clock.
+            self._arrivals[cover] = self.hass.loop.call_later(
+                remaining, self._async_arrived, cover)
+            return
+        self.async_untrack(cover)
+        cover.async_write_ha_state()
+        self.hass.async_create_task(cover.device.auto_stop_if_necessary())
+
+    @callback
+    def _async_update_positions(self):
+        """Publish the calculated position of all travelling covers."""
+        self._update_handle = None
+        for cover in self._arrivals:
+            cover.async_write_ha_state()
+        if self._arrivals:
+            self._update_handle = self.hass.loop.call_later(
+                self.update_interval, self._async_update_positions)
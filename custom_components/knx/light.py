@@ -1,27 +1,41 @@
 """Support for KNX/IP lights."""
 from enum import Enum
+from functools import lru_cache
 
 import voluptuous as vol
 from xknx.devices import Light as XknxLight
+from xknx.knx import Telegram
+
+from ._kts_light_group import KTSLightGroup
 
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_COLOR_TEMP,
     ATTR_HS_COLOR,
+    ATTR_TRANSITION,
     ATTR_WHITE_VALUE,
     PLATFORM_SCHEMA,
     SUPPORT_BRIGHTNESS,
     SUPPORT_COLOR,
     SUPPORT_COLOR_TEMP,
+    SUPPORT_TRANSITION,
     SUPPORT_WHITE_VALUE,
     Light,
 )
-from homeassistant.const import CONF_ADDRESS, CONF_NAME
+from homeassistant.const import ATTR_ENTITY_ID, CONF_ADDRESS, CONF_NAME
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 import homeassistant.util.color as color_util
 
+from . import (
+    ATTR_DISCOVER_DEVICES,
+    CONF_KNX_LIGHT_BURST_WRITES,
+    DATA_KNX,
+    DOMAIN,
+    SIGNAL_KNX_CONNECTION_STATE,
+)
+
 
 CONF_STATE_ADDRESS = "state_address"
 CONF_BRIGHTNESS_ADDRESS = "brightness_address"
@@ -35,6 +49,7 @@ CONF_RGBW_ADDRESS = "rgbw_address"
 CONF_RGBW_STATE_ADDRESS = "rgbw_state_address"
 CONF_MIN_KELVIN = "min_kelvin"
 CONF_MAX_KELVIN = "max_kelvin"
+CONF_MEMBERS = "members"
 
 DEFAULT_NAME = "KNX Light"
 DEFAULT_COLOR = (0.0, 0.0)
@@ -44,6 +59,14 @@ DEFAULT_WHITE_VALUE = 255
 DEFAULT_MIN_KELVIN = 2700  # 370 mireds
 DEFAULT_MAX_KELVIN = 6000  # 166 mireds
 
+DATA_KNX_LIGHT_TRANSITION = "data_knx_light_transition"
+# KNX light entities by device name, used to resolve group members
+DATA_KNX_LIGHTS = "data_knx_lights"
+
+# Fades may use this share of the bus capacity given by rate_limit
+FADE_BUS_SHARE = 0.5
+FADE_MIN_INTERVAL = 0.1
+
 
 class ColorTempModes(Enum):
     """Color temperature modes for config validation."""
@@ -52,29 +75,34 @@ class ColorTempModes(Enum):
     relative = "DPT-5.001"
 
 
-PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
-    {
-        vol.Required(CONF_ADDRESS): cv.string,
-        vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
-        vol.Optional(CONF_STATE_ADDRESS): cv.string,
-        vol.Optional(CONF_BRIGHTNESS_ADDRESS): cv.string,
-        vol.Optional(CONF_BRIGHTNESS_STATE_ADDRESS): cv.string,
-        vol.Optional(CONF_COLOR_ADDRESS): cv.string,
-        vol.Optional(CONF_COLOR_STATE_ADDRESS): cv.string,
-        vol.Optional(CONF_COLOR_TEMP_ADDRESS): cv.string,
-        vol.Optional(CONF_COLOR_TEMP_STATE_ADDRESS): cv.string,
-        vol.Optional(CONF_COLOR_TEMP_MODE, default=DEFAULT_COLOR_TEMP_MODE): cv.enum(
-            ColorTempModes
-        ),
-        vol.Optional(CONF_RGBW_ADDRESS): cv.string,
-        vol.Optional(CONF_RGBW_STATE_ADDRESS): cv.string,
-        vol.Optional(CONF_MIN_KELVIN, default=DEFAULT_MIN_KELVIN): vol.All(
-            vol.Coerce(int), vol.Range(min=1)
-        ),
-        vol.Optional(CONF_MAX_KELVIN, default=DEFAULT_MAX_KELVIN): vol.All(
-            vol.Coerce(int), vol.Range(min=1)
-        ),
-    }
+PLATFORM_SCHEMA = vol.All(
+    PLATFORM_SCHEMA.extend(
+        {
+            # Central switch address, optional for a light group
+            vol.Optional(CONF_ADDRESS): cv.string,
+            vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
+            vol.Optional(CONF_STATE_ADDRESS): cv.string,
+            vol.Optional(CONF_BRIGHTNESS_ADDRESS): cv.string,
+            vol.Optional(CONF_BRIGHTNESS_STATE_ADDRESS): cv.string,
+            vol.Optional(CONF_COLOR_ADDRESS): cv.string,
+            vol.Optional(CONF_COLOR_STATE_ADDRESS): cv.string,
+            vol.Optional(CONF_COLOR_TEMP_ADDRESS): cv.string,
+            vol.Optional(CONF_COLOR_TEMP_STATE_ADDRESS): cv.string,
+            vol.Optional(CONF_COLOR_TEMP_MODE, default=DEFAULT_COLOR_TEMP_MODE): cv.enum(
+                ColorTempModes
+            ),
+            vol.Optional(CONF_RGBW_ADDRESS): cv.string,
+            vol.Optional(CONF_RGBW_STATE_ADDRESS): cv.string,
+            vol.Optional(CONF_MIN_KELVIN, default=DEFAULT_MIN_KELVIN): vol.All(
+                vol.Coerce(int), vol.Range(min=1)
+            ),
+            vol.Optional(CONF_MAX_KELVIN, default=DEFAULT_MAX_KELVIN): vol.All(
+                vol.Coerce(int), vol.Range(min=1)
+            ),
+            vol.Optional(CONF_MEMBERS): vol.All(cv.ensure_list, [cv.string]),
+        }
+    ),
+    cv.has_at_least_one_key(CONF_ADDRESS, CONF_MEMBERS),
 )
 
 
@@ -99,6 +127,10 @@ def async_add_entities_discovery(hass, discovery_info, async_add_entities):
 @callback
 def async_add_entities_config(hass, config, async_add_entities):
     """Set up light for KNX platform configured within platform."""
+    if CONF_MEMBERS in config:
+        async_add_light_group_config(hass, config, async_add_entities)
+        return
+
     group_address_tunable_white = None
     group_address_tunable_white_state = None
     group_address_color_temp = None
@@ -132,6 +164,19 @@ def async_add_entities_config(hass, config, async_add_entities):
     async_add_entities([KNXLight(light)])
 
 
+@callback
+def async_add_light_group_config(hass, config, async_add_entities):
+    """Set up light group for KNX platform configured within platform."""
+    light_group = KTSLightGroup(
+        hass.data[DATA_KNX].xknx,
+        name=config[CONF_NAME],
+        members=config[CONF_MEMBERS],
+        group_address_switch=config.get(CONF_ADDRESS),
+    )
+    hass.data[DATA_KNX].xknx.devices.add(light_group)
+    async_add_entities([KNXLightGroup(light_group)])
+
+
 class KNXLight(Light):
     """Representation of a KNX light."""
 
@@ -147,6 +192,39 @@ class KNXLight(Light):
         self._max_mireds = color_util.color_temperature_kelvin_to_mired(
             self._min_kelvin
         )
+        # Converted values of the current device state, cleared on update
+        self._converted = {}
+        self._tunable_white_to_mireds = None
+        self._mireds_to_tunable_white = None
+        if device.supports_tunable_white:
+            self._build_tunable_white_tables()
+
+    def _build_tunable_white_tables(self):
+        """Precompute relative color temperature <-> mireds."""
+        # as KNX devices typically use Kelvin we use it as base for
+        # calculating ct from percent
+        self._tunable_white_to_mireds = [
+            color_util.color_temperature_kelvin_to_mired(
+                self._min_kelvin
+                + ((relative_ct / 255) * (self._max_kelvin - self._min_kelvin))
+            )
+            for relative_ct in range(256)
+        ]
+        self._mireds_to_tunable_white = {}
+        for mireds in range(
+            min(self._min_mireds, self._max_mireds),
+            max(self._min_mireds, self._max_mireds) + 1,
+        ):
+            self._mireds_to_tunable_white[mireds] = int(
+                255
+                * (self._kelvin(mireds) - self._min_kelvin)
+                / (self._max_kelvin - self._min_kelvin)
+            )
+
+    def _kelvin(self, mireds):
+        """Convert mireds to Kelvin within the range of the light."""
+        kelvin = int(color_util.color_temperature_mired_to_kelvin(mireds))
+        return min(self._max_kelvin, max(self._min_kelvin, kelvin))
 
     @callback
     def async_register_callbacks(self):
@@ -154,13 +232,23 @@ class KNXLight(Light):
 
         async def after_update_callback(device):
             """Call after device was updated."""
-            await self.async_update_ha_state()
+            self._converted.clear()
+            # E.g. a wall switch turned the light off while fading
+            async_get_transition_engine(self.hass).async_check(self)
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
 
         self.device.register_device_updated_cb(after_update_callback)
 
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
+
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
+        lights = self.hass.data.setdefault(DATA_KNX_LIGHTS, {})
+        lights[self.device.name] = self
+        self.async_on_remove(
+            lambda name=self.device.name: lights.pop(name, None))
 
     @property
     def name(self):
@@ -187,10 +275,14 @@ class KNXLight(Light):
     @property
     def hs_color(self):
         """Return the HS color value."""
-        rgb = None
-        if self.device.supports_rgbw or self.device.supports_color:
-            rgb, _ = self.device.current_color
-        return color_util.color_RGB_to_hs(*rgb) if rgb else None
+        if "hs_color" not in self._converted:
+            rgb = None
+            if self.device.supports_rgbw or self.device.supports_color:
+                rgb, _ = self.device.current_color
+            self._converted["hs_color"] = (
+                color_util.color_RGB_to_hs(*rgb) if rgb else None
+            )
+        return self._converted["hs_color"]
 
     @property
     def white_value(self):
@@ -203,6 +295,12 @@ class KNXLight(Light):
     @property
     def color_temp(self):
         """Return the color temperature in mireds."""
+        if "color_temp" not in self._converted:
+            self._converted["color_temp"] = self._convert_color_temp()
+        return self._converted["color_temp"]
+
+    def _convert_color_temp(self):
+        """Convert the color temperature of the device to mireds."""
         if self.device.supports_color_temperature:
             kelvin = self.device.current_color_temperature
             if kelvin is not None:
@@ -210,12 +308,9 @@ class KNXLight(Light):
         if self.device.supports_tunable_white:
             relative_ct = self.device.current_tunable_white
             if relative_ct is not None:
-                # as KNX devices typically use Kelvin we use it as base for
-                # calculating ct from percent
-                return color_util.color_temperature_kelvin_to_mired(
-                    self._min_kelvin
-                    + ((relative_ct / 255) * (self._max_kelvin - self._min_kelvin))
-                )
+                return self._tunable_white_to_mireds[
+                    min(255, max(0, int(relative_ct)))
+                ]
         return None
 
     @property
@@ -248,7 +343,7 @@ class KNXLight(Light):
         """Flag supported features."""
         flags = 0
         if self.device.supports_brightness:
-            flags |= SUPPORT_BRIGHTNESS
+            flags |= SUPPORT_BRIGHTNESS | SUPPORT_TRANSITION
         if self.device.supports_color:
             flags |= SUPPORT_COLOR | SUPPORT_BRIGHTNESS
         if self.device.supports_rgbw:
@@ -269,21 +364,25 @@ class KNXLight(Light):
         update_white_value = ATTR_WHITE_VALUE in kwargs
         update_color_temp = ATTR_COLOR_TEMP in kwargs
 
-        # avoid conflicting changes and weird effects
-        if not (
-            self.is_on
-            or update_brightness
-            or update_color
-            or update_white_value
-            or update_color_temp
-        ):
-            await self.device.set_on()
+        transitions = async_get_transition_engine(self.hass)
+        transitions.async_cancel(self)
+
+        # Telegrams of this call as (remote value, value), switch first
+        writes = []
+        update_dimming = False
 
         if self.device.supports_brightness and (update_brightness and not update_color):
             # if we don't need to update the color, try updating brightness
             # directly if supported; don't do it if color also has to be
             # changed, as RGB color implicitly sets the brightness as well
-            await self.device.set_brightness(brightness)
+            if kwargs.get(ATTR_TRANSITION):
+                start = self.brightness if self.is_on else 0
+                transitions.async_start(
+                    self, start or 0, brightness, kwargs[ATTR_TRANSITION]
+                )
+            else:
+                writes.append((self.device.brightness, brightness))
+            update_dimming = True
         elif (self.device.supports_rgbw or self.device.supports_color) and (
             update_brightness or update_color or update_white_value
         ):
@@ -296,23 +395,262 @@ class KNXLight(Light):
                 hs_color = DEFAULT_COLOR
             if white_value is None and self.device.supports_rgbw:
                 white_value = DEFAULT_WHITE_VALUE
-            rgb = color_util.color_hsv_to_RGB(*hs_color, brightness * 100 / 255)
-            await self.device.set_color(rgb, white_value)
+            rgb = _hsv_to_rgb(tuple(hs_color), brightness)
+            if self.device.supports_rgbw:
+                writes.append((self.device.rgbw, list(rgb) + [white_value]))
+            else:
+                writes.append((self.device.color, rgb))
+            update_dimming = True
 
         if update_color_temp:
-            kelvin = int(color_util.color_temperature_mired_to_kelvin(mireds))
-            kelvin = min(self._max_kelvin, max(self._min_kelvin, kelvin))
-
             if self.device.supports_color_temperature:
-                await self.device.set_color_temperature(kelvin)
+                writes.append((self.device.color_temperature, self._kelvin(mireds)))
             elif self.device.supports_tunable_white:
-                relative_ct = int(
-                    255
-                    * (kelvin - self._min_kelvin)
-                    / (self._max_kelvin - self._min_kelvin)
-                )
-                await self.device.set_tunable_white(relative_ct)
+                relative_ct = self._mireds_to_tunable_white.get(mireds)
+                if relative_ct is None:
+                    relative_ct = int(
+                        255
+                        * (self._kelvin(mireds) - self._min_kelvin)
+                        / (self._max_kelvin - self._min_kelvin)
+                    )
+                writes.append((self.device.tunable_white, relative_ct))
+
+        # Dimming actuators switch on by themselves when brightness or
+        # color is sent, avoid conflicting changes and weird effects
+        if not (self.is_on or update_dimming):
+            writes.insert(0, (self.device.switch, True))
+
+        await self._async_write(writes)
+
+    async def _async_write(self, writes):
+        """Send values to the light, all in one burst if configured."""
+        if not self.hass.data[DATA_KNX].config[DOMAIN][CONF_KNX_LIGHT_BURST_WRITES]:
+            for remote_value, value in writes:
+                await remote_value.set(value)
+            return
+        # Queue the telegrams back to back and update the state only once
+        telegrams = []
+        for remote_value, value in writes:
+            if not remote_value.writable:
+                continue
+            remote_value.payload = remote_value.to_knx(value)
+            telegrams.append(
+                Telegram(remote_value.group_address, payload=remote_value.payload)
+            )
+        for telegram in telegrams:
+            await self.device.xknx.telegrams.put(telegram)
+        if telegrams:
+            await self.device.after_update()
 
     async def async_turn_off(self, **kwargs):
         """Turn the light off."""
+        transitions = async_get_transition_engine(self.hass)
+        transitions.async_cancel(self)
+        if (
+            kwargs.get(ATTR_TRANSITION)
+            and self.device.supports_brightness
+            and self.is_on
+            and self.brightness
+        ):
+            transitions.async_start(
+                self, self.brightness, 0, kwargs[ATTR_TRANSITION], turn_off=True
+            )
+            return
+        await self.device.set_off()
+
+
+class KNXLightGroup(Light):
+    """Representation of a group of KNX lights."""
+
+    def __init__(self, device):
+        """Initialize of KNX light group."""
+        self.device = device
+
+    @callback
+    def async_register_callbacks(self):
+        """Register callbacks to update hass after device was changed."""
+
+        async def after_update_callback(device):
+            """Call after device was updated."""
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
+
+        self.device.register_device_updated_cb(after_update_callback)
+
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
+
+    async def async_added_to_hass(self):
+        """Store register state change callback."""
+        self.async_register_callbacks()
+
+    @property
+    def name(self):
+        """Return the name of the KNX device."""
+        return self.device.name
+
+    @property
+    def available(self):
+        """Return True if entity is available."""
+        return self.hass.data[DATA_KNX].connected
+
+    @property
+    def should_poll(self):
+        """No polling needed within KNX."""
+        return False
+
+    @property
+    def is_on(self):
+        """Return true if any light of the group is on."""
+        return self.device.state
+
+    @property
+    def device_state_attributes(self):
+        """Return the entity ids of the member lights."""
+        lights = self.hass.data.get(DATA_KNX_LIGHTS, {})
+        return {ATTR_ENTITY_ID: [lights[name].entity_id
+                                 for name in self.device.member_names
+                                 if name in lights]}
+
+    async def async_turn_on(self, **kwargs):
+        """Turn all lights of the group on."""
+        await self.device.set_on()
+
+    async def async_turn_off(self, **kwargs):
+        """Turn all lights of the group off."""
         await self.device.set_off()
+
+
+@lru_cache(maxsize=256)
+def _hsv_to_rgb(hs_color, brightness):
+    """Convert HS color and brightness 0..255 to RGB."""
+    return color_util.color_hsv_to_RGB(*hs_color, brightness * 100 / 255)
+
+
+@callback
+def async_get_transition_engine(hass):
+    """Return the transition engine shared by all KNX lights."""
+    if DATA_KNX_LIGHT_TRANSITION not in hass.data:
+        hass.data[DATA_KNX_LIGHT_TRANSITION] = LightTransitionEngine(
+            hass, hass.data[DATA_KNX].xknx
+        )
+    return hass.data[DATA_KNX_LIGHT_TRANSITION]
+
+
+class LightFade:
+    """Linear brightness fade of one light."""
+
+    def __init__(self, start, target, started, duration, turn_off=False):
+        """Initialize the fade."""
+        # pylint: disable=too-many-arguments
+        self.start = start
+        self.target = target
+        self.started = started
+        self.duration = duration
+        self.turn_off = turn_off
+        self.brightness = start
+
+    def brightness_at(self, now):
+        """Return the brightness at loop time now."""
+        progress = min((now - self.started) / self.duration, 1)
+        return int(round(self.start + (self.target - self.start) * progress))
+
+    def finished(self, now):
+        """Return if the fade is over at loop time now."""
+        return now >= self.started + self.duration
+
+
+class LightTransitionEngine:
+    """Run the brightness fades of all KNX lights on one shared tick.
+
+    Every tick sends at most one brightness telegram per fading light. The
+    tick is stretched so that fades use at most FADE_BUS_SHARE of the bus
+    capacity, after the telegrams already queued by others. The HA state
+    of a light is written once the fade finished, not for every step.
+    """
+
+    def __init__(self, hass, xknx):
+        """Initialize the transition engine."""
+        self.hass = hass
+        self.xknx = xknx
+        self._fades = {}
+        self._tick_handle = None
+
+    @callback
+    def async_start(self, light, start, target, duration, turn_off=False):
+        """Start fading a light from start to target brightness."""
+        # pylint: disable=too-many-arguments
+        self._fades[light] = LightFade(
+            start, target, self.hass.loop.time(), duration, turn_off
+        )
+        switch = light.device.switch
+        if target and not light.device.state:
+            # Dimming actuators switch on with the first brightness step
+            switch.payload = switch.to_knx(True)
+        if self._tick_handle is None:
+            self._tick_handle = self.hass.loop.call_soon(self._async_tick)
+
+    @callback
+    def async_cancel(self, light):
+        """Stop fading a light at its current brightness."""
+        self._fades.pop(light, None)
+
+    @callback
+    def async_check(self, light):
+        """Cancel the fade of a light changed by someone else."""
+        fade = self._fades.get(light)
+        if fade is None:
+            return
+        # Feedback of the actuator may lag behind, every brightness already
+        # sent by the fade is expected.
+        brightness = light.device.current_brightness
+        low, high = sorted((fade.start, fade.brightness))
+        if not light.device.state or (
+            brightness is not None and not low <= brightness <= high
+        ):
+            self.async_cancel(light)
+
+    def tick_interval(self):
+        """Return seconds until the next step of all fades."""
+        if not self.xknx.rate_limit:
+            return FADE_MIN_INTERVAL
+        queued = self.xknx.telegrams.qsize() / self.xknx.rate_limit
+        steps = len(self._fades) / (self.xknx.rate_limit * FADE_BUS_SHARE)
+        return max(FADE_MIN_INTERVAL, queued + steps)
+
+    @callback
+    def _async_tick(self):
+        """Send the next brightness step of every fading light."""
+        self._tick_handle = None
+        now = self.hass.loop.time()
+        writes = []
+        finished = []
+        for light, fade in list(self._fades.items()):
+            brightness = fade.brightness_at(now)
+            if fade.finished(now):
+                del self._fades[light]
+                finished.append(light)
+                if fade.turn_off:
+                    writes.append((light.device.switch, False))
+                    continue
+            if brightness != fade.brightness:
+                fade.brightness = brightness
+                writes.append((light.device.brightness, brightness))
+        if writes or finished:
+            self.hass.async_create_task(self._async_send(writes, finished))
+        if self._fades:
+            self._tick_handle = self.hass.loop.call_later(
+                self.tick_interval(), self._async_tick
+            )
+
+    async def _async_send(self, writes, finished):
+        """Send one step of all fading lights."""
+        # Raw telegrams, set() would write the HA state for every step
+        for remote_value, value in writes:
+            if not remote_value.writable:
+                continue
+            remote_value.payload = remote_value.to_knx(value)
+            await self.xknx.telegrams.put(
+                Telegram(remote_value.group_address, payload=remote_value.payload)
+            )
+        for light in finished:
+            await light.device.after_update()
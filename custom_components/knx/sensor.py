@@ -2,13 +2,15 @@
 import voluptuous as vol
 from xknx.devices import Sensor as XknxSensor
 
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX
 from homeassistant.components.sensor import PLATFORM_SCHEMA
 from homeassistant.const import CONF_NAME, CONF_TYPE
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
 
+from . import ATTR_DISCOVER_DEVICES, DATA_KNX, SIGNAL_KNX_CONNECTION_STATE
+
 
 CONF_STATE_ADDRESS = "state_address"
 CONF_SYNC_STATE = "sync_state"
@@ -69,10 +71,13 @@ class KNXSensor(Entity):
 
         async def after_update_callback(device):
             """Call after device was updated."""
-            await self.async_update_ha_state()
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
 
         self.device.register_device_updated_cb(after_update_callback)
 
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
+
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
@@ -2,11 +2,13 @@
 import voluptuous as vol
 from xknx.devices import Switch as XknxSwitch
 
-from homeassistant.components.knx import ATTR_DISCOVER_DEVICES, DATA_KNX
 from homeassistant.components.switch import PLATFORM_SCHEMA, SwitchDevice
 from homeassistant.const import CONF_ADDRESS, CONF_NAME
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from . import ATTR_DISCOVER_DEVICES, DATA_KNX, SIGNAL_KNX_CONNECTION_STATE
 
 
 CONF_STATE_ADDRESS = "state_address"
@@ -65,10 +67,13 @@ class KNXSwitch(SwitchDevice):
 
         async def after_update_callback(device):
             """Call after device was updated."""
-            await self.async_update_ha_state()
+            await self.hass.data[DATA_KNX].async_update_entity_state(self)
 
         self.device.register_device_updated_cb(after_update_callback)
 
+        self.async_on_remove(async_dispatcher_connect(
+            self.hass, SIGNAL_KNX_CONNECTION_STATE, self.async_write_ha_state))
+
     async def async_added_to_hass(self):
         """Store register state change callback."""
         self.async_register_callbacks()
@@ -0,0 +1,241 @@
+"""
+Run python_scripts with cached bytecode on a bounded worker pool.
+
+Scripts are the same as for the python_script component and run in the
+same sandbox, but
+
+ - the compiled code of every script is cached until the file changes,
+ - scripts run on their own pool of max_workers threads,
+ - the run time of every script is exposed as sensor.python_script_<name>,
+   measured on the worker without the time waiting for a free worker.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import glob
+import logging
+import os
+import threading
+import time
+
+import voluptuous as vol
+
+from homeassistant.components.python_script import (
+    ALLOWED_DATETIME,
+    ALLOWED_DT_UTIL,
+    ALLOWED_EVENTBUS,
+    ALLOWED_HASS,
+    ALLOWED_SERVICEREGISTRY,
+    ALLOWED_STATEMACHINE,
+    ALLOWED_TIME,
+    FOLDER,
+    ScriptError,
+    StubPrinter,
+    TimeWrapper,
+)
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, SERVICE_RELOAD
+from homeassistant.core import callback
+from homeassistant.helpers import discovery
+from homeassistant.util import sanitize_filename
+import homeassistant.util.dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+DOMAIN = 'python_script_runner'
+DATA_PYTHON_SCRIPT_RUNNER = 'data_python_script_runner'
+
+CONF_MAX_WORKERS = 'max_workers'
+
+DEFAULT_MAX_WORKERS = 2
+
+ATTR_RUNS = 'runs'
+ATTR_AVERAGE = 'average'
+
+CONFIG_SCHEMA = vol.Schema({
+    DOMAIN: vol.Schema({
+        vol.Optional(CONF_MAX_WORKERS, default=DEFAULT_MAX_WORKERS):
+            vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+    })
+}, extra=vol.ALLOW_EXTRA)
+
+
+async def async_setup(hass, config):
+    """Set up the python script runner."""
+    path = hass.config.path(FOLDER)
+    if not os.path.isdir(path):
+        _LOGGER.warning("Folder %s not found in configuration folder", FOLDER)
+        return False
+
+    runner = PythonScriptRunner(hass, config[DOMAIN][CONF_MAX_WORKERS])
+    hass.data[DATA_PYTHON_SCRIPT_RUNNER] = runner
+
+    async def async_reload_scripts(call):
+        """Handle reload service calls."""
+        runner.clear_cache()
+        await runner.async_discover_scripts()
+
+    await runner.async_discover_scripts()
+    hass.services.async_register(DOMAIN, SERVICE_RELOAD, async_reload_scripts)
+    hass.async_create_task(
+        discovery.async_load_platform(hass, 'sensor', DOMAIN, {}, config))
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, runner.async_stop)
+    return True
+
+
+class PythonScriptRunner:
+    """Compile, cache and run python scripts."""
+
+    def __init__(self, hass, max_workers):
+        """Initialize the runner."""
+        self.hass = hass
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._code = {}
+        self._builtins = self._restricted_builtins()
+        self.script_names = set()
+        # Run time sensors by script name, added by the sensor platform
+        self.sensors = {}
+        self.async_add_sensors = None
+
+    @callback
+    def async_stop(self, event):
+        """Shut down the worker pool."""
+        self._executor.shutdown(wait=False)
+
+    def clear_cache(self):
+        """Forget all compiled scripts."""
+        with self._lock:
+            self._code.clear()
+
+    async def async_discover_scripts(self):
+        """Register a service for every script in the folder."""
+        path = self.hass.config.path(FOLDER)
+        names = await self.hass.async_add_executor_job(
+            glob.glob, os.path.join(path, '*.py'))
+
+        for existing_service in list(
+                self.hass.services.async_services().get(DOMAIN, {})):
+            if existing_service != SERVICE_RELOAD:
+                self.hass.services.async_remove(DOMAIN, existing_service)
+
+        for fil in names:
+            name = os.path.splitext(os.path.basename(fil))[0]
+            self.script_names.add(name)
+            self.hass.services.async_register(
+                DOMAIN, name, self._async_service_handler)
+        if self.async_add_sensors is not None:
+            self.async_add_sensors(self.script_names)
+
+    async def _async_service_handler(self, call):
+        """Handle python script service calls."""
+        await self.async_run(call.service, call.data)
+
+    async def async_run(self, name, data=None):
+        """Run a script on the worker pool and record its run time."""
+        duration = await self.hass.loop.run_in_executor(
+            self._executor, self.execute, name, data)
+        sensor = self.sensors.get(name)
+        if duration is not None and sensor is not None:
+            sensor.async_record(duration)
+
+    def get_code(self, name):
+        """Return the compiled code of a script, compile only if changed."""
+        from RestrictedPython import compile_restricted_exec
+
+        filename = '{}.py'.format(name)
+        path = self.hass.config.path(FOLDER, sanitize_filename(filename))
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            cached = self._code.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path) as fil:
+            source = fil.read()
+        compiled = compile_restricted_exec(source, filename=filename)
+        if compiled.errors:
+            _LOGGER.error("Error loading script %s: %s",
+                          filename, ", ".join(compiled.errors))
+            return None
+        if compiled.warnings:
+            _LOGGER.warning("Warning loading script %s: %s",
+                            filename, ", ".join(compiled.warnings))
+        with self._lock:
+            self._code[name] = (mtime, compiled.code)
+        return compiled.code
+
+    def execute(self, name, data=None):
+        """Execute a script, called on a worker thread.
+
+        Return the run time in seconds or None if the script was not run.
+        """
+        from RestrictedPython.Eval import default_guarded_getitem
+        from RestrictedPython.Guards import (
+            full_write_guard,
+            guarded_iter_unpack_sequence,
+            guarded_unpack_sequence,
+        )
+
+        start = time.monotonic()
+        try:
+            code = self.get_code(name)
+        except OSError as err:
+            _LOGGER.error("Error reading script %s: %s", name, err)
+            return None
+        if code is None:
+            return None
+
+        restricted_globals = {
+            "__builtins__": self._builtins,
+            "_print_": StubPrinter,
+            "_getattr_": self._protected_getattr,
+            "_write_": full_write_guard,
+            "_getiter_": iter,
+            "_getitem_": default_guarded_getitem,
+            "_iter_unpack_sequence_": guarded_iter_unpack_sequence,
+            "_unpack_sequence_": guarded_unpack_sequence,
+        }
+        logger = logging.getLogger('{}.{}.py'.format(__name__, name))
+        local = {"hass": self.hass, "data": data or {}, "logger": logger}
+
+        try:
+            _LOGGER.info("Executing %s.py: %s", name, data)
+            # pylint: disable=exec-used
+            exec(code, restricted_globals, local)
+        except ScriptError as err:
+            logger.error("Error executing script: %s", err)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception("Error executing script: %s", err)
+        return time.monotonic() - start
+
+    @staticmethod
+    def _restricted_builtins():
+        """Return the builtins available to scripts."""
+        from RestrictedPython.Guards import safe_builtins
+        from RestrictedPython.Utilities import utility_builtins
+
+        builtins = safe_builtins.copy()
+        builtins.update(utility_builtins)
+        builtins["datetime"] = datetime
+        builtins["sorted"] = sorted
+        builtins["time"] = TimeWrapper()
+        builtins["dt_util"] = dt_util
+        return builtins
+
+    def _protected_getattr(self, obj, name, default=None):
+        """Restricted method to get attributes."""
+        # pylint: disable=too-many-boolean-expressions
+        hass = self.hass
+        if name.startswith("async_"):
+            raise ScriptError("Not allowed to access async methods")
+        if (
+                obj is hass and name not in ALLOWED_HASS
+                or obj is hass.bus and name not in ALLOWED_EVENTBUS
+                or obj is hass.states and name not in ALLOWED_STATEMACHINE
+                or obj is hass.services and name not in ALLOWED_SERVICEREGISTRY
+                or obj is dt_util and name not in ALLOWED_DT_UTIL
+                or obj is datetime and name not in ALLOWED_DATETIME
+                or isinstance(obj, TimeWrapper) and name not in ALLOWED_TIME):
+            raise ScriptError("Not allowed to access {}.{}".format(
+                obj.__class__.__name__, name))
+
+        return getattr(obj, name, default)
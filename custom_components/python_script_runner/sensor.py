@@ -0,0 +1,90 @@
+"""Run time sensors of the python scripts run by python_script_runner."""
+from homeassistant.core import callback
+from homeassistant.helpers.restore_state import RestoreEntity
+
+from . import ATTR_AVERAGE, ATTR_RUNS, DATA_PYTHON_SCRIPT_RUNNER
+
+
+async def async_setup_platform(hass, config, async_add_entities,
+                               discovery_info=None):
+    """Set up a run time sensor for every python script."""
+    if discovery_info is None:
+        return
+    runner = hass.data[DATA_PYTHON_SCRIPT_RUNNER]
+
+    @callback
+    def async_add_sensors(names):
+        """Add sensors for scripts which have none yet."""
+        sensors = [PythonScriptRunTimeSensor(name) for name in sorted(names)
+                   if name not in runner.sensors]
+        for sensor in sensors:
+            runner.sensors[sensor.script] = sensor
+        async_add_entities(sensors)
+
+    runner.async_add_sensors = async_add_sensors
+    async_add_sensors(runner.script_names)
+
+
+class PythonScriptRunTimeSensor(RestoreEntity):
+    """Run time of the last run of a python script."""
+
+    def __init__(self, script):
+        """Initialize the sensor."""
+        self.script = script
+        self.entity_id = 'sensor.python_script_{}'.format(script)
+        self._state = None
+        self._runs = 0
+        self._total = 0
+
+    async def async_added_to_hass(self):
+        """Restore the timings of the runs before the restart."""
+        state = await self.async_get_last_state()
+        if state is None:
+            return
+        try:
+            self._state = float(state.state)
+            self._runs = int(state.attributes.get(ATTR_RUNS, 0))
+            self._total = float(
+                state.attributes.get(ATTR_AVERAGE, 0)) * self._runs
+        except ValueError:
+            self._state = None
+
+    @callback
+    def async_record(self, duration):
+        """Record the run time of one run in seconds."""
+        self._state = round(duration * 1000, 1)
+        self._runs += 1
+        self._total += self._state
+        # A run may finish before the entity is added
+        if self.hass is not None:
+            self.async_write_ha_state()
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return '{} run time'.format(self.script)
+
+    @property
+    def should_poll(self):
+        """No polling, updated after every run."""
+        return False
+
+    @property
+    def state(self):
+        """Return the run time of the last run in ms."""
+        return self._state
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return 'ms'
+
+    @property
+    def device_state_attributes(self):
+        """Return the number of runs and the average run time."""
+        if not self._runs:
+            return None
+        return {
+            ATTR_RUNS: self._runs,
+            ATTR_AVERAGE: round(self._total / self._runs, 1),
+        }
@@ -1,11 +1,5 @@
 """ Turn off lights that are on. """
 
-lights = []
-
-for state in hass.states.all():
-    if state.entity_id.startswith('light.') and state.state == 'on':
-        lights.append(state.entity_id)
-
-if lights:
-    data = {'entity_id': lights}
-    hass.services.call('light', 'turn_off', data)
\ No newline at end of file
+# The knx component keeps an index of entities by state, so the lights
+# which are on are found without scanning all states.
+hass.services.call('knx', 'turn_off_domain', {'domain': 'light'})
@@ -0,0 +1,233 @@
+# Fixture checks and benchmark for the HeWeather sensor, run it with the
+# Python environment of Home Assistant from the configuration directory:
+#
+#     python tools/heweather/benchmark.py --delay 0.2 --rounds 100
+#
+# The recorded API responses in fixtures/ are used to
+#  - set up the platform with fixture_dir and check the state of every sensor,
+#  - measure time and memory of one full update read from the fixtures,
+#  - serve them from a local HTTP stub with an artificial delay to measure
+#    how many requests run concurrently and the end to end update latency.
+# The same fixtures can be used by HA itself with the fixture_dir option.
+import argparse
+import asyncio
+from datetime import timedelta
+import os
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+from homeassistant import core
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(TOOLS_DIR, "fixtures")
+CONFIG_DIR = os.path.dirname(os.path.dirname(TOOLS_DIR))
+
+sys.path.insert(0, CONFIG_DIR)
+from custom_components.HeWeather import sensor  # noqa: E402
+
+# Stub URL path below API_URL -> fixture name
+STUB_PATHS = {
+    "weather/now": "now",
+    "air/now": "air",
+    "weather/lifestyle": "lifestyle",
+    "weather/forecast": "forecast",
+    "weather/hourly": "hourly",
+}
+
+# Option code -> state expected from the fixtures
+EXPECTED = {
+    "tmp": "19",
+    "fl": "18",
+    "cond_txt": "多云",
+    "wind_dir": "东北风",
+    "aqi": "58",
+    "main": "PM10",
+    "pm25": "38",
+    "comf": "舒适",
+    "cw": "适宜",
+    "tmp_max": "21",
+    "tmp_min": "13",
+    "pop": "0",
+    "wind_sc": "3-4",
+    "forecast": 12,
+}
+
+# cond_code has no sensor, it is only used for the icon of others
+ALL_OPTIONS = [option for option in sensor.OPTIONS if option != "cond_code"]
+
+# Every endpoint is due again on the next refresh
+NO_INTERVALS = {endpoint: timedelta(0) for endpoint in sensor.DEFAULT_INTERVALS}
+
+
+async def async_check_sensors(hass):
+    config = sensor.PLATFORM_SCHEMA({
+        "platform": "HeWeather",
+        "city": "fixture",
+        "appkey": "benchmark",
+        "options": ALL_OPTIONS,
+        "fixture_dir": FIXTURE_DIR,
+    })
+    entities = []
+    await sensor.async_setup_platform(hass, config, entities.extend)
+    await hass.async_block_till_done()
+    entities = {entity.name: entity for entity in entities}
+
+    errors = []
+    for option, expected in EXPECTED.items():
+        state = entities[sensor.OPTIONS[option][0]].state
+        if state != expected:
+            errors.append("{}: {!r} != {!r}".format(option, state, expected))
+
+    def attributes(option):
+        return entities[sensor.OPTIONS[option][0]].device_state_attributes or {}
+
+    suggestion = attributes("comf").get(sensor.ATTRIBUTION_SUGGESTION)
+    if not suggestion or not suggestion.startswith("白天不太热"):
+        errors.append("comf suggestion: {!r}".format(suggestion))
+    attribution = attributes("tmp").get(sensor.ATTRIBUTION_SUGGESTION)
+    if attribution != sensor.ATTRIBUTION:
+        errors.append("tmp attribution: {!r}".format(attribution))
+
+    if sensor.ATTR_DAILY in attributes("forecast"):
+        errors.append("forecast series in the state attributes")
+
+    for error in errors:
+        print("FAIL", error)
+    print("sensors: {} states checked, {}".format(
+        len(EXPECTED), "ok" if not errors else "{} errors".format(len(errors))))
+    return not errors
+
+
+async def async_benchmark_fixture_updates(hass, rounds):
+    data = sensor.WeatherData(hass, "fixture", "benchmark", "fixture", FIXTURE_DIR,
+                              ALL_OPTIONS, NO_INTERVALS)
+    await data.async_refresh()
+    series = sensor.forecast_series(data)
+    daily = series[sensor.ATTR_DAILY]
+    hourly = series[sensor.ATTR_HOURLY]
+    ok = True
+    if daily["tmp_min"] != [13, 12, 11] or daily["pop"] != [0, 5, 55]:
+        print("FAIL daily series: {}".format(daily))
+        ok = False
+    if len(hourly["tmp"]) != 8 or hourly["time"][0] != "2019-11-02 13:00":
+        print("FAIL hourly series: {}".format(hourly))
+        ok = False
+    tmp_min = daily["tmp_min"]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await data.async_refresh()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    await data.async_refresh()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("update from fixtures: {:.2f} ms per update, peak {} bytes, retained {} bytes".format(
+        elapsed / rounds * 1e3, peak - before, current - before))
+    # The series are refilled, not allocated again on every update
+    in_place = sensor.forecast_series(data)[sensor.ATTR_DAILY]["tmp_min"] is tmp_min
+    print("forecast arrays: {}".format("refilled in place" if in_place else "FAIL new per update"))
+    return ok and in_place
+
+
+async def async_start_stub(delay):
+    responses = {}
+    for path, name in STUB_PATHS.items():
+        with open(os.path.join(FIXTURE_DIR, name + ".json"), encoding="utf-8") as fixture:
+            responses[path] = fixture.read()
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def handle(request):
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(delay)
+            return web.Response(text=responses[request.match_info["path"]],
+                                content_type="application/json")
+        finally:
+            stats["in_flight"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/s6/{path:.+}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    # Free port picked by the OS
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    await web.SockSite(runner, sock).start()
+    return runner, "http://127.0.0.1:{}/s6/".format(sock.getsockname()[1]), stats
+
+
+async def async_benchmark_stub_updates(hass, delay, rounds):
+    runner, url, stats = await async_start_stub(delay)
+    # Endpoint URLs are built from API_URL when the data is created
+    sensor.API_URL = url
+    data = sensor.WeatherData(hass, "stub", "benchmark", "stub",
+                              options=ALL_OPTIONS, intervals=NO_INTERVALS)
+    updated = []
+    data.async_add_listener(lambda: updated.append(time.perf_counter()))
+
+    latencies = []
+    try:
+        for _ in range(rounds):
+            count = len(updated)
+            start = time.perf_counter()
+            await data.async_refresh()
+            if len(updated) == count:
+                print("FAIL update without data")
+                continue
+            latencies.append(updated[-1] - start)
+    finally:
+        await runner.cleanup()
+
+    endpoints = len(STUB_PATHS)
+    print("update: {} endpoints, {} requests, max {} concurrent".format(
+        endpoints, stats["requests"], stats["max_in_flight"]))
+    if not latencies:
+        return False
+    print("update latency: {:.3f} s average, {:.3f} s sequential would be".format(
+        sum(latencies) / len(latencies), endpoints * delay))
+    return stats["max_in_flight"] == endpoints
+
+
+async def async_run(hass, args):
+    ok = await async_check_sensors(hass)
+    ok = await async_benchmark_fixture_updates(hass, args.rounds) and ok
+    ok = await async_benchmark_stub_updates(hass, args.delay, args.updates) and ok
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the HeWeather sensor")
+    parser.add_argument("--delay", type=float, default=0.2,
+                        help="seconds the stub waits before every response")
+    parser.add_argument("--rounds", type=int, default=100,
+                        help="updates from the fixtures for the timing")
+    parser.add_argument("--updates", type=int, default=3,
+                        help="updates fetched from the stub")
+    args = parser.parse_args()
+
+    # Same setup as the benchmark script of HA, caches go to a temporary
+    # configuration directory
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = core.HomeAssistant(loop)
+        hass.config.config_dir = config_dir
+        try:
+            ok = loop.run_until_complete(async_run(hass, args))
+        finally:
+            loop.run_until_complete(hass.async_stop(force=True))
+            loop.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()